@@ -0,0 +1,77 @@
+"""
+Server cache benchmark
+Sends repeated GenerateImage calls to the Go image server and reports cold vs warm latency and cache tiers
+
+直接呼叫 stub（不經過 client 的 output/ 快取），以 x-cache / x-cache-tier trailer 判斷命中的層級。
+對象必須是 Go server（--addr）：fake_server 只模擬 trailer，量不到真正的 LRU / 磁碟快取。
+
+用法（在專案根目錄執行）：
+    python -m bench.fake_openai --port 8089 --latency-ms 200            # 假的 OpenAI，不花額度
+    (cd image/server && OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=fake go run .)
+    python -m bench.cache --addr localhost:50051 --prompts 50 --repeats 5 --run-id r1
+    # 重啟 Go server 後以相同 --run-id 再跑一次：cold 應由磁碟快取命中（x-cache-tier: disk）
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import grpc
+
+from bench.stats import summarize
+from image.client.client import stubs
+
+def call(stub, prompt: str) -> Tuple[float, str]:
+    """送出一次 GenerateImage，回傳 (秒數, 命中層級)；未命中為 miss"""
+    image_pb2, _ = stubs()
+    start = time.perf_counter()
+    _, rpc = stub.GenerateImage.with_call(image_pb2.ImageRequest(prompt=prompt, accept_formats=["png"]))
+    elapsed = time.perf_counter() - start
+    trailers = dict(rpc.trailing_metadata())
+    if trailers.get("x-cache") != "hit":
+        return elapsed, "miss"
+    return elapsed, trailers.get("x-cache-tier") or "hit"
+
+def run_pass(stub, prompts: List[str], concurrency: int) -> Dict[str, object]:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda p: call(stub, p), prompts))
+    tiers = Counter(tier for _, tier in results)
+    return {
+        "requests": len(prompts),
+        "hit_rate": round(1 - tiers["miss"] / len(prompts), 3) if prompts else 0.0,
+        "tiers": dict(tiers),
+        **summarize([seconds for seconds, _ in results]),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Server-side image cache benchmark")
+    parser.add_argument("--addr", required=True, help="Go image server 位址，例如 localhost:50051")
+    parser.add_argument("--prompts", type=int, default=50, help="不重複的 prompt 數")
+    parser.add_argument("--repeats", type=int, default=5, help="cold 之後重複送出的次數")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--run-id", help="prompt 前綴；沿用同一個值可測試重啟後的磁碟快取")
+    args = parser.parse_args(argv)
+
+    address = args.addr
+    run_id = args.run_id or uuid.uuid4().hex[:8]
+    prompts = [f"cache bench {run_id} #{i}" for i in range(args.prompts)]
+    _, image_pb2_grpc = stubs()
+    channel = grpc.insecure_channel(address)
+    stub = image_pb2_grpc.ImageServiceStub(channel)
+    report = {"address": address, "run_id": run_id, "concurrency": args.concurrency}
+    try:
+        report["cold"] = run_pass(stub, prompts, args.concurrency)
+        report["warm"] = run_pass(stub, prompts * args.repeats, args.concurrency)
+    finally:
+        channel.close()
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
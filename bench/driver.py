@@ -0,0 +1,271 @@
+"""
+End-to-end benchmark driver
+Runs pipeline scenarios under open- or closed-loop load and reports throughput and latency as JSON
+
+用法（在專案根目錄執行）：
+    # closed-loop：固定 4 個並行使用者，共 100 次
+    python -m bench.driver --scenario generate_image --mode closed --concurrency 4 --requests 100
+
+    # open-loop：每秒 5 次（Poisson 到達），持續 30 秒
+    python -m bench.driver --scenario main_flow --mode open --rate 5 --duration 30 --decisions y,y,s,r
+
+Scenarios: generate_image, generate_batch, get_ready_notes, main_flow
+
+未指定 --servers 時會自動啟動 --replicas 個 bench.fake_server；
+要測真正的 Go server，可加上 --fake-openai-port 啟動假的 OpenAI，
+再以 OPENAI_BASE_URL=http://localhost:<port>/v1 啟動 Go server 並用 --servers 指向它。
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from bench.stats import summarize
+
+# 審核決策寫回 Notion 後的狀態
+NOTION_STATUS = {"posted": "Published", "skipped": "Skipped", "retry": "Retry"}
+
+class Scenario:
+    """Builds the operation to benchmark; each call of op(i) is one measured request"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:8]
+        self._decisions = itertools.cycle([d.strip().lower() for d in args.decisions.split(",") if d.strip()])
+        self._decision_lock = threading.Lock()
+
+    def decide(self, prompt: str, filepath: str) -> str:
+        """依 --decisions 循環回傳審核決策，取代互動輸入"""
+        with self._decision_lock:
+            return next(self._decisions)
+
+    def _trigger(self):
+        from bench.fake_notion import FakeNotionClient
+        from notion.trigger import NotionTrigger
+
+        fake = FakeNotionClient(latency_ms=self.args.notion_latency_ms)
+        fake.seed(self.args.notes, prefix=f"Bench {self.run_id} {random.random():.6f}")
+        return NotionTrigger(client=fake, database_id=fake.database_id)
+
+    def op(self) -> Callable[[int], None]:
+        scenario = self.args.scenario
+        if scenario == "generate_image":
+            from image.client.client import generate_image
+            return lambda i: generate_image(f"bench {self.run_id} image #{i}")
+
+        if scenario == "generate_batch":
+            from image.client.client import generate_batch
+            size = self.args.batch_size
+            return lambda i: generate_batch([f"bench {self.run_id} batch #{i}-{j}" for j in range(size)])
+
+        if scenario == "get_ready_notes":
+            trigger = self._trigger()
+            return lambda i: trigger.get_ready_notes(limit=self.args.notes)
+
+        if scenario == "main_flow":
+            from scheduler import pipeline
+            from utils.journal import Journal
+
+            def run_main(i: int) -> None:
+                trigger = self._trigger()
+                # 每次執行使用自己的 journal，並行的流程不會互相補寫狀態或 compact 同一個檔案
+                journal = Journal(path=f"journal-{self.run_id}-{i}.jsonl")
+                results = pipeline.run(trigger=trigger, journal=journal, decide=self.decide,
+                                       preview=lambda path: None)
+                # 狀態寫回失敗時流程不會拋出例外（留待下次補寫），直接檢查假 Notion 計為錯誤
+                failed = [note_id for note_id, decision in results
+                          if trigger.notion.status_of(note_id) != NOTION_STATUS[decision]]
+                if failed:
+                    raise RuntimeError(f"{len(failed)} 筆 Notion 狀態寫回失敗")
+
+            return run_main
+
+        raise ValueError(f"unknown scenario: {scenario}")
+
+def run_closed(op: Callable[[int], None], concurrency: int, requests: int, duration: float) -> Dict[str, object]:
+    """closed-loop：每個使用者完成上一個請求後才送下一個"""
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def user() -> None:
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if requests and i >= requests:
+                return
+            if deadline and time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                op(i)
+                ok = True
+            except Exception as e:
+                print(f"⚠️ 請求 {i} 失敗：{e}", file=sys.stderr)
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "errors": errors}
+
+def run_open(op: Callable[[int], None], rate: float, duration: float, requests: int,
+             max_inflight: int) -> Dict[str, object]:
+    """
+    open-loop：依 Poisson 到達送出請求，不等待前一個完成
+
+    延遲從「預定到達時間」起算，排隊時間也會計入，避免 coordinated omission。
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def issue(i: int, scheduled: float) -> None:
+        nonlocal errors
+        try:
+            op(i)
+            ok = True
+        except Exception as e:
+            print(f"⚠️ 請求 {i} 失敗：{e}", file=sys.stderr)
+            ok = False
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    next_at = start
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        for i in itertools.count():
+            if requests and i >= requests:
+                break
+            if duration and next_at - start >= duration:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(issue, i, next_at)
+            next_at += random.expovariate(rate)
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies, "errors": errors}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument("--scenario", required=True,
+                        choices=["generate_image", "generate_batch", "get_ready_notes", "main_flow"])
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="closed-loop 並行使用者數")
+    parser.add_argument("--rate", type=float, default=2.0, help="open-loop 每秒到達數")
+    parser.add_argument("--max-inflight", type=int, default=64, help="open-loop 最大同時請求數")
+    parser.add_argument("--requests", type=int, default=0, help="總請求數（0 代表只看 --duration）")
+    parser.add_argument("--duration", type=float, default=0.0, help="持續秒數（0 代表只看 --requests）")
+    parser.add_argument("--servers", help="逗號分隔的 image server 位址；未指定時自動啟動 fake server")
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--base-port", type=int, default=50101)
+    parser.add_argument("--server-latency-ms", type=float, default=200.0)
+    parser.add_argument("--notion-latency-ms", type=float, default=50.0)
+    parser.add_argument("--notes", type=int, default=5, help="每次 get_ready_notes / main_flow 的筆記數")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--decisions", default="y", help="main_flow 的審核決策序列，例如 y,s,r")
+    parser.add_argument("--fake-openai-port", type=int, help="同時啟動假的 OpenAI 端點")
+    parser.add_argument("--output", help="將 JSON 報告寫入檔案（預設輸出到 stdout）")
+    args = parser.parse_args(argv)
+
+    if not args.requests and not args.duration:
+        args.requests = 50
+
+    procs = {}
+    openai_server = None
+    workdir = tempfile.mkdtemp(prefix="bench-driver-")
+    cwd = os.getcwd()
+    # 流程中的進度訊息導向 stderr，stdout 只輸出 JSON 報告
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            from image.client import client
+
+            if args.scenario != "get_ready_notes":
+                if args.servers:
+                    addresses = [a.strip() for a in args.servers.split(",") if a.strip()]
+                else:
+                    from bench.sharding import start_replicas
+                    procs = start_replicas(args.replicas, args.base_port, args.server_latency_ms)
+                    addresses = list(procs)
+                client.configure_servers(addresses)
+
+            if args.fake_openai_port:
+                from bench.fake_openai import FakeOpenAIConfig, serve
+                openai_config = FakeOpenAIConfig(latency_ms=args.server_latency_ms)
+                openai_server = serve(args.fake_openai_port, openai_config)
+
+            # 產出的圖片與 history.csv 都寫到暫存目錄，避免污染專案
+            client.OUTPUT_DIR = workdir
+            sys.path.insert(0, cwd)
+            os.chdir(workdir)
+
+            op = Scenario(args).op()
+            if args.mode == "closed":
+                result = run_closed(op, args.concurrency, args.requests, args.duration)
+            else:
+                result = run_open(op, args.rate, args.duration, args.requests, args.max_inflight)
+        finally:
+            os.chdir(cwd)
+            for proc in procs.values():
+                proc.terminate()
+            if openai_server is not None:
+                openai_server.shutdown()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    completed = len(result["latencies"])
+    report = {
+        "scenario": args.scenario,
+        "mode": args.mode,
+        "params": {
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "requests": args.requests,
+            "duration": args.duration,
+            "notes": args.notes,
+            "batch_size": args.batch_size,
+            "decisions": args.decisions,
+        },
+        "completed": completed,
+        "errors": result["errors"],
+        "elapsed_s": round(result["elapsed"], 3),
+        "throughput_ops": round(completed / result["elapsed"], 3) if result["elapsed"] else 0.0,
+        "latency": summarize(result["latencies"]),
+    }
+    if openai_server is not None:
+        report["fake_openai"] = dict(openai_config.counts)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
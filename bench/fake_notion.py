@@ -0,0 +1,148 @@
+"""
+Fake Notion client
+An in-memory stand-in for notion_client.Client that NotionTrigger can be pointed at
+
+    from bench.fake_notion import FakeNotionClient
+    from notion.trigger import NotionTrigger
+
+    fake = FakeNotionClient(latency_ms=120)
+    fake.seed(20)
+    trigger = NotionTrigger(client=fake, database_id=fake.database_id)
+"""
+import copy
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+def _rich_text(text: str) -> List[Dict[str, Any]]:
+    return [{"type": "text", "plain_text": text, "text": {"content": text}}]
+
+class _Endpoint:
+    def __init__(self, client: "FakeNotionClient"):
+        self._client = client
+
+class _Databases(_Endpoint):
+    def query(self, database_id: str, **kwargs) -> Dict[str, Any]:
+        return self._client._query(database_id, **kwargs)
+
+class _Children(_Endpoint):
+    def list(self, block_id: str, **kwargs) -> Dict[str, Any]:
+        return self._client._list_children(block_id)
+
+class _Blocks(_Endpoint):
+    def __init__(self, client: "FakeNotionClient"):
+        super().__init__(client)
+        self.children = _Children(client)
+
+class _Pages(_Endpoint):
+    def update(self, page_id: str, **kwargs) -> Dict[str, Any]:
+        return self._client._update_page(page_id, kwargs.get("properties", {}))
+
+class FakeNotionClient:
+    """Stores pages in memory and supports the query filters NotionTrigger uses"""
+
+    def __init__(self, database_id: str = "bench-database", latency_ms: float = 0.0):
+        """
+        Args:
+            database_id: 假資料庫 ID
+            latency_ms: 每次 API 呼叫的模擬延遲
+        """
+        self.database_id = database_id
+        self.latency_ms = latency_ms
+        self.databases = _Databases(self)
+        self.blocks = _Blocks(self)
+        self.pages = _Pages(self)
+        self.calls: Dict[str, int] = {"query": 0, "children": 0, "update": 0}
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._blocks: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def add_note(self, title: str, content: str = "", status: str = "Ready", publish: bool = True,
+                 tags: Optional[List[str]] = None, prompt: str = "") -> str:
+        """新增一篇筆記，回傳 page id"""
+        page_id = str(uuid.uuid4())
+        properties = {
+            "Name": {"type": "title", "title": _rich_text(title)},
+            "Status": {"type": "select", "select": {"name": status}},
+            "Publish": {"type": "checkbox", "checkbox": publish},
+            "Tags": {"type": "multi_select", "multi_select": [{"name": t} for t in tags or []]},
+            "Prompt": {"type": "rich_text", "rich_text": _rich_text(prompt) if prompt else []},
+            "Post URL": {"type": "url", "url": None},
+        }
+        with self._lock:
+            self._pages[page_id] = {
+                "id": page_id,
+                "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+                "created_time": time.time(),
+                "properties": properties,
+            }
+            self._blocks[page_id] = [
+                {"type": "paragraph", "paragraph": {"rich_text": _rich_text(line)}}
+                for line in content.split("\n") if line
+            ]
+        return page_id
+
+    def seed(self, count: int, status: str = "Ready", publish: bool = True, prefix: str = "Bench note") -> List[str]:
+        """一次建立多篇筆記"""
+        return [
+            self.add_note(f"{prefix} {i}", f"Content of {prefix.lower()} {i}\nSecond line", status, publish)
+            for i in range(count)
+        ]
+
+    def status_of(self, page_id: str) -> str:
+        with self._lock:
+            return self._pages[page_id]["properties"]["Status"]["select"]["name"]
+
+    def _delay(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+    def _query(self, database_id: str, filter: Optional[Dict[str, Any]] = None,
+               sorts: Optional[List[Dict[str, Any]]] = None, page_size: int = 100, **kwargs) -> Dict[str, Any]:
+        self._delay("query")
+        if database_id != self.database_id:
+            raise ValueError(f"unknown database: {database_id}")
+        with self._lock:
+            pages = [p for p in self._pages.values() if self._matches(p, filter)]
+            pages.sort(key=lambda p: p["created_time"])
+            if sorts and sorts[0].get("direction") == "descending":
+                pages.reverse()
+            results = [copy.deepcopy(p) for p in pages[:page_size]]
+        return {"object": "list", "results": results, "has_more": len(pages) > page_size}
+
+    def _list_children(self, block_id: str) -> Dict[str, Any]:
+        self._delay("children")
+        with self._lock:
+            return {"object": "list", "results": copy.deepcopy(self._blocks.get(block_id, []))}
+
+    def _update_page(self, page_id: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        self._delay("update")
+        with self._lock:
+            page = self._pages[page_id]
+            for name, value in properties.items():
+                prop = page["properties"].setdefault(name, {})
+                prop.update(value)
+            return copy.deepcopy(page)
+
+    def _matches(self, page: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+        if not flt:
+            return True
+        if "and" in flt:
+            return all(self._matches(page, f) for f in flt["and"])
+        if "or" in flt:
+            return any(self._matches(page, f) for f in flt["or"])
+
+        prop = page["properties"].get(flt.get("property"), {})
+        if "select" in flt:
+            current = (prop.get("select") or {}).get("name")
+            cond = flt["select"]
+            if "equals" in cond:
+                return current == cond["equals"]
+            if "does_not_equal" in cond:
+                return current != cond["does_not_equal"]
+        if "checkbox" in flt:
+            return prop.get("checkbox") == flt["checkbox"].get("equals")
+        return True
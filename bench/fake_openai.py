@@ -0,0 +1,134 @@
+"""
+Fake OpenAI images endpoint
+Serves POST /v1/images/generations with configurable latency, error and 429 distributions
+
+用法（在專案根目錄執行）：
+    python -m bench.fake_openai --port 8089 --latency-ms 1500 --sigma 0.4 --error-rate 0.02 --throttle-rate 0.05
+
+讓 Go image server 改打這個端點：
+    OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=fake go run .
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from bench.fake_server import fake_png
+
+class FakeOpenAIConfig:
+    """Latency is log-normal around latency_ms; errors and 429s are drawn per request"""
+
+    def __init__(self, latency_ms: float = 1500.0, sigma: float = 0.3, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = 1, size: int = 256):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.size = size
+        self.counts: Dict[str, int] = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0}
+        self.lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """回傳秒數；中位數為 latency_ms，sigma 控制長尾"""
+        if self.latency_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.latency_ms), self.sigma) / 1000
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] += 1
+
+def make_handler(config: FakeOpenAIConfig):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: Dict[str, str] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with config.lock:
+                    self._send_json(200, dict(config.counts))
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/images/generations"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid json"}})
+                return
+
+            config.count("requests")
+            roll = random.random()
+            if roll < config.throttle_rate:
+                config.count("throttled")
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                {"Retry-After": str(config.retry_after)})
+                return
+
+            time.sleep(config.sample_latency())
+
+            if roll < config.throttle_rate + config.error_rate:
+                config.count("errors")
+                self._send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+                return
+
+            image = fake_png(payload.get("prompt", ""), config.size)
+            config.count("ok")
+            self._send_json(200, {
+                "created": int(time.time()),
+                "data": [{"b64_json": base64.b64encode(image).decode("ascii")}],
+            })
+
+    return Handler
+
+def serve(port: int, config: FakeOpenAIConfig) -> ThreadingHTTPServer:
+    """在背景執行緒啟動 server，回傳 server 物件（呼叫 shutdown() 停止）"""
+    server = ThreadingHTTPServer(("localhost", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI images endpoint")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=1500.0, help="延遲中位數")
+    parser.add_argument("--sigma", type=float, default=0.3, help="log-normal sigma，越大長尾越明顯")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 500 的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="回傳 429 的比例")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    config = FakeOpenAIConfig(args.latency_ms, args.sigma, args.error_rate,
+                              args.throttle_rate, args.retry_after, args.size)
+    server = ThreadingHTTPServer(("localhost", args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"🧪 fake OpenAI listening on http://localhost:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Fake image server
+A local ImageService replica backed by a fake generator, for benchmarks and sharding demos
+
+用法（在專案根目錄執行）：
+    python -m bench.fake_server --port 50061 --latency-ms 800
+"""
+import argparse
+import hashlib
+import io
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from image.client.client import BACKGROUND_METADATA, REFRESH_METADATA, stubs
+from image.client.transcode import normalize_format, transcode_image
+from utils.tracing import SERVER_TIMING_HEADER
+
+image_pb2, image_pb2_grpc = stubs()
+
+def _timing(*parts, item: str = "") -> str:
+    """與 Go server 相同的 x-server-timing 格式：name;dur=ms，batch item 前加上 item;desc=<hash>"""
+    entries = [f"item;desc={item}"] if item else []
+    entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in parts]
+    return ", ".join(entries)
+
+def fake_png(prompt: str, size: int) -> bytes:
+    """依 prompt 產生固定的雜訊圖片，模擬 OpenAI 回傳的 png"""
+    from PIL import Image
+
+    seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    noise = Image.effect_noise((size, size), 32 + seed % 32).convert("RGB")
+    tint = Image.new("RGB", (size, size), (seed % 256, (seed >> 8) % 256, (seed >> 16) % 256))
+    buf = io.BytesIO()
+    Image.blend(noise, tint, 0.5).save(buf, format="PNG")
+    return buf.getvalue()
+
+class FakeImageService(image_pb2_grpc.ImageServiceServicer):
+    """ImageService with an in-memory cache keyed by prompt hash"""
+
+    def __init__(self, latency_ms: float = 500.0, jitter_ms: float = 100.0, size: int = 256,
+                 tail_rate: float = 0.0, tail_ms: float = 0.0, shed_background: bool = False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.size = size
+        # 模擬長尾：tail_rate 比例的請求額外延遲 tail_ms
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        # 模擬沒有閒置額度：背景請求一律回傳 RESOURCE_EXHAUSTED
+        self.shed_background = shed_background
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def _generate(self, prompt: str, refresh: bool = False):
+        """回傳 (prompt hash, png bytes, 是否快取命中)；未命中或 refresh 時模擬產圖延遲"""
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self.lock:
+            data = None if refresh else self.cache.get(key)
+        if data is not None:
+            return key, data, True
+
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms))
+        if random.random() < self.tail_rate:
+            delay += self.tail_ms
+        time.sleep(delay / 1000)
+        data = fake_png(prompt, self.size)
+        with self.lock:
+            self.cache[key] = data
+        return key, data, False
+
+    @staticmethod
+    def _encode(data: bytes, accept, quality: int):
+        """與 Go server 相同的協商規則：只產出 png / jpeg"""
+        for fmt in accept:
+            fmt = normalize_format(fmt)
+            if fmt == "png":
+                return data, "png"
+            if fmt == "jpeg":
+                return transcode_image(data, "jpeg", quality or 85), "jpeg"
+        return data, "png"
+
+    def _cached(self, prompt: str) -> bool:
+        with self.lock:
+            return hashlib.sha1(prompt.encode("utf-8")).hexdigest() in self.cache
+
+    def _admitted(self, context) -> bool:
+        """與 Go server 相同：只有快取未命中的 prompt 需要額度"""
+        return not (self.shed_background and set(BACKGROUND_METADATA) & set(context.invocation_metadata()))
+
+    def GenerateImage(self, request, context):
+        start = time.perf_counter()
+        refresh = bool(set(REFRESH_METADATA) & set(context.invocation_metadata()))
+        if (refresh or not self._cached(request.prompt)) and not self._admitted(context):
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "no idle quota for background generation")
+        key, data, hit = self._generate(request.prompt, refresh)
+        generated = time.perf_counter()
+        data, file_type = self._encode(data, request.accept_formats, request.quality)
+        done = time.perf_counter()
+        cache = (("x-cache", "hit"), ("x-cache-tier", "memory")) if hit else (("x-cache", "miss"),)
+        context.set_trailing_metadata(cache + (
+            (SERVER_TIMING_HEADER, _timing(("openai", generated - start), ("encode", done - generated),
+                                           ("total", done - start))),
+        ))
+        return image_pb2.ImageResponse(image_data=data, prompt_hash=key, file_type=file_type)
+
+    def GenerateBatch(self, request, context):
+        start = time.perf_counter()
+        prompts = list(request.prompts)
+        if not self._admitted(context):
+            # 額度不足：只回傳快取命中的，全部未命中時拒絕
+            prompts = [prompt for prompt in prompts if self._cached(prompt)]
+            if not prompts:
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "no idle quota for background generation")
+        items = []
+        timings = []
+        hits = 0
+        for prompt in prompts:
+            picked = time.perf_counter()
+            key, data, hit = self._generate(prompt)
+            generated = time.perf_counter()
+            hits += hit
+            data, file_type = self._encode(data, request.accept_formats, request.quality)
+            done = time.perf_counter()
+            items.append(image_pb2.BatchItem(prompt=prompt, prompt_hash=key, image_data=data, file_type=file_type))
+            timings.append((SERVER_TIMING_HEADER, _timing(("queue", picked - start), ("openai", generated - picked),
+                                                          ("encode", done - generated), item=key)))
+        timings.append((SERVER_TIMING_HEADER, _timing(("total", time.perf_counter() - start))))
+        context.set_trailing_metadata((("x-cache-hits", str(hits)),) + tuple(timings))
+        return image_pb2.BatchResponse(items=items)
+
+def serve(port: int, latency_ms: float, jitter_ms: float, size: int, workers: int = 8,
+          tail_rate: float = 0.0, tail_ms: float = 0.0, shed_background: bool = False) -> grpc.Server:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    service = FakeImageService(latency_ms, jitter_ms, size, tail_rate, tail_ms, shed_background)
+    image_pb2_grpc.add_ImageServiceServicer_to_server(service, server)
+    server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    return server
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run a fake ImageService replica")
+    parser.add_argument("--port", type=int, default=50061)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="額外延遲的請求比例（0-1）")
+    parser.add_argument("--tail-ms", type=float, default=0.0, help="長尾請求的額外延遲")
+    parser.add_argument("--shed-background", action="store_true",
+                        help="背景請求（預先產圖）一律回傳 RESOURCE_EXHAUSTED，模擬沒有閒置額度")
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.latency_ms, args.jitter_ms, args.size, args.workers,
+                   args.tail_rate, args.tail_ms, args.shed_background)
+    print(f"🧪 fake image server listening on localhost:{args.port}", flush=True)
+    server.wait_for_termination()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Output format benchmark
+Compares encoded size and wall time per output format
+
+用法（在專案根目錄執行）：
+    python -m bench.formats                      # 使用合成的照片類圖片
+    python -m bench.formats --image output/x.png # 使用既有圖片
+    python -m bench.formats --server localhost:50051 --prompt "a cat"
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from image.client.transcode import DEFAULT_QUALITY, normalize_formats, transcode_image
+
+def synthetic_photo(size: int = 1024) -> bytes:
+    """產生帶雜訊與漸層的圖片，壓縮特性接近照片（純色圖會讓 png 看起來太好）"""
+    from PIL import Image
+
+    noise = Image.effect_noise((size, size), 48).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    mandel = Image.effect_mandelbrot((size, size), (-2.0, -1.25, 0.75, 1.25), 64).convert("RGB")
+    img = Image.blend(Image.blend(gradient, mandel, 0.5), noise, 0.25)
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def bench_local(source: bytes, formats: List[str], quality: int, rounds: int) -> List[Dict[str, Any]]:
+    """在本機以 PIL 編碼，量測每種格式的大小與耗時"""
+    results = []
+    for fmt in formats:
+        timings = []
+        encoded = b""
+        for _ in range(rounds):
+            start = time.perf_counter()
+            encoded = transcode_image(source, fmt, quality)
+            timings.append(time.perf_counter() - start)
+        results.append({
+            "format": fmt,
+            "bytes": len(encoded),
+            "ratio_vs_source": round(len(encoded) / len(source), 4),
+            "encode_ms_median": round(statistics.median(timings) * 1000, 2),
+        })
+    return results
+
+def bench_server(address: str, prompt: str, formats: List[str], quality: int) -> List[Dict[str, Any]]:
+    """透過 gRPC 逐一要求各格式，量測傳輸大小與端到端耗時"""
+    import grpc
+    from image.client.client import stubs
+    image_pb2, image_pb2_grpc = stubs()
+
+    results = []
+    with grpc.insecure_channel(address) as channel:
+        stub = image_pb2_grpc.ImageServiceStub(channel)
+        for fmt in formats:
+            request = image_pb2.ImageRequest(prompt=prompt, accept_formats=[fmt], quality=quality)
+            start = time.perf_counter()
+            response = stub.GenerateImage(request)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "requested": fmt,
+                "file_type": response.file_type,
+                "bytes": len(response.image_data),
+                "wall_ms": round(elapsed * 1000, 2),
+            })
+    return results
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare output formats by size and time")
+    parser.add_argument("--image", help="來源圖片路徑（預設使用合成圖片）")
+    parser.add_argument("--formats", default="png,jpeg,webp", help="逗號分隔的格式清單")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--server", help="gRPC server 位址，指定時改測端到端")
+    parser.add_argument("--prompt", default="benchmark: a photographic landscape")
+    args = parser.parse_args(argv)
+
+    formats = normalize_formats(args.formats.split(","))
+
+    if args.server:
+        report = {
+            "mode": "server",
+            "server": args.server,
+            "quality": args.quality,
+            "results": bench_server(args.server, args.prompt, formats, args.quality),
+        }
+    else:
+        if args.image:
+            with open(args.image, "rb") as f:
+                source = f.read()
+        else:
+            source = synthetic_photo()
+        report = {
+            "mode": "local",
+            "source_bytes": len(source),
+            "quality": args.quality,
+            "results": bench_local(source, formats, args.quality, args.rounds),
+        }
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Hedging benchmark
+Compares GenerateImage tail latency with and without hedged requests against long-tailed fake replicas
+
+用法（在專案根目錄執行）：
+    python -m bench.hedging --requests 200 --tail-rate 0.05 --tail-ms 2000
+"""
+import argparse
+import contextlib
+import json
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from bench.sharding import start_replicas
+from bench.stats import summarize
+from image.client import client
+from image.client.replicas import ReplicaPool
+
+def run(addresses: List[str], requests: int, warmup: int, hedge_ratio: float, label: str) -> Dict[str, object]:
+    """
+    以獨立的 replica pool 逐一送出不重複的 prompt（避免 server 快取影響）
+
+    先送 warmup 筆請求累積各 replica 的延遲樣本，樣本不足時不會 hedge。
+    """
+    from image.client.client import stubs
+    _, image_pb2_grpc = stubs()
+
+    pool = ReplicaPool(addresses, image_pb2_grpc.ImageServiceStub, hedge_ratio=hedge_ratio)
+    client._pool = pool
+    latencies = []
+    try:
+        for i in range(warmup):
+            client.generate_image(f"hedging {label} warmup #{i}", formats=["png"])
+        pool.hedge_budget.sent = 0
+        for i in range(requests):
+            start = time.perf_counter()
+            client.generate_image(f"hedging {label} #{i}", formats=["png"])
+            latencies.append(time.perf_counter() - start)
+    finally:
+        pool.close()
+    return {"hedge_ratio": hedge_ratio, "hedges_sent": pool.hedge_budget.sent, **summarize(latencies)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hedged request benchmark")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--base-port", type=int, default=50081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=1000.0)
+    parser.add_argument("--hedge-ratio", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    procs = start_replicas(args.replicas, args.base_port, args.latency_ms,
+                           ["--tail-rate", str(args.tail_rate), "--tail-ms", str(args.tail_ms)])
+    workdir = tempfile.mkdtemp(prefix="bench-hedging-")
+    client.OUTPUT_DIR = workdir
+    # client 的進度訊息導向 stderr，stdout 只輸出 JSON 報告
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            addresses = list(procs)
+            report = {
+                "replicas": addresses,
+                "requests": args.requests,
+                "baseline": run(addresses, args.requests, args.warmup, 0.0, "baseline"),
+                "hedged": run(addresses, args.requests, args.warmup, args.hedge_ratio, "hedged"),
+            }
+        finally:
+            for proc in procs.values():
+                proc.terminate()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Sharding demo
+Starts several fake image server processes and shows cache affinity, key movement and ejection
+
+用法（在專案根目錄執行）：
+    python -m bench.sharding --replicas 3 --prompts 60
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import grpc
+
+from image.client import client
+from image.client.sharding import HashRing
+
+image_pb2, _ = client.stubs()
+
+def start_replicas(count: int, base_port: int, latency_ms: float,
+                   extra_args: List[str] = ()) -> Dict[str, subprocess.Popen]:
+    procs = {}
+    for i in range(count):
+        port = base_port + i
+        procs[f"localhost:{port}"] = subprocess.Popen(
+            [sys.executable, "-m", "bench.fake_server", "--port", str(port),
+             "--latency-ms", str(latency_ms), *extra_args],
+            stdout=subprocess.DEVNULL,
+        )
+    for address in procs:
+        channel = grpc.insecure_channel(address)
+        grpc.channel_ready_future(channel).result(timeout=30)
+        channel.close()
+    return procs
+
+def run_pass(prompts: List[str]) -> Dict[str, object]:
+    """依 client 的路由逐一送出，統計每個 replica 的請求數與 server 端快取命中"""
+    pool = client.get_replica_pool()
+    per_replica: Counter = Counter()
+    hits = 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        address = pool.primary(client.prompt_hash(prompt))
+        request = image_pb2.ImageRequest(prompt=prompt, accept_formats=["png"])
+        try:
+            _, call = pool.stub(address).GenerateImage.with_call(request)
+        except grpc.RpcError:
+            pool.eject(address)
+            address = pool.primary(client.prompt_hash(prompt))
+            _, call = pool.stub(address).GenerateImage.with_call(request)
+        per_replica[address] += 1
+        hits += dict(call.trailing_metadata()).get("x-cache") == "hit"
+    return {
+        "wall_s": round(time.perf_counter() - start, 3),
+        "per_replica": dict(per_replica),
+        "server_cache_hit_rate": round(hits / len(prompts), 3),
+    }
+
+def moved_fraction(keys: List[str], before: List[str], after: List[str]) -> float:
+    ring_before, ring_after = HashRing(before), HashRing(after)
+    moved = sum(ring_before.get_node(k) != ring_after.get_node(k) for k in keys)
+    return round(moved / len(keys), 4)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Consistent-hash sharding demo")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--prompts", type=int, default=60)
+    parser.add_argument("--base-port", type=int, default=50061)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    procs = start_replicas(args.replicas, args.base_port, args.latency_ms)
+    addresses = list(procs)
+    prompts = [f"sharding demo prompt #{i}" for i in range(args.prompts)]
+    keys = [client.prompt_hash(p) for p in prompts]
+    report = {"replicas": addresses}
+
+    try:
+        client.configure_servers(addresses)
+        report["cold"] = run_pass(prompts)
+        report["warm"] = run_pass(prompts)
+
+        extra = f"localhost:{args.base_port + args.replicas}"
+        report["moved_on_add"] = moved_fraction(keys, addresses, addresses + [extra])
+        report["moved_on_remove"] = moved_fraction(keys, addresses, addresses[1:])
+        report["ideal_moved_on_add"] = round(1 / (len(addresses) + 1), 4)
+
+        victim = addresses[0]
+        procs[victim].terminate()
+        procs[victim].wait()
+        report["after_kill"] = run_pass(prompts)
+        report["after_kill"]["ejected"] = [a for a in addresses if client.get_replica_pool().is_ejected(a)]
+    finally:
+        client.get_replica_pool().close()
+        for proc in procs.values():
+            proc.terminate()
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+CLI startup guard
+Measures main.py startup time and checks that light subcommands stay free of heavy imports
+
+用法（在專案根目錄執行，超出預算或有多餘 import 時 exit code 為 1）：
+    python -m bench.startup --runs 10 --budget-ms 150
+
+同樣的檢查也由 tests/test_startup.py 在 pytest 中執行（預算可用 AI_POSTER_STARTUP_BUDGET_MS 調整）。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# 只有真正需要時（產圖、審核、Notion、發佈）才應載入的模組
+HEAVY_MODULES = ("grpc", "notion_client", "PIL", "requests", "httpx", "google.protobuf", "image_pb2", "yaml")
+
+DEFAULT_BUDGET_MS = 150.0
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# `main.py --help`、`import main` 與 `import image.client.client` 都不應載入重模組或有副作用
+PROBE = """
+import contextlib, io, json, os, sys
+path_before = list(sys.path)
+import main
+light = sorted(m for m in {heavy!r} if m in sys.modules)
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        main.cli(["--help"])
+    except SystemExit:
+        pass
+help_heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+output_dir = os.path.join(os.getcwd(), "output")
+existed = os.path.exists(output_dir)
+import image.client.client as client
+print(json.dumps({{
+    "heavy_after_import_main": light,
+    "heavy_after_help": help_heavy,
+    "sys_path_changed": sys.path != path_before,
+    "output_dir_created": not existed and os.path.exists(client.OUTPUT_DIR),
+    "pb_loaded_by_client_import": "image_pb2" in sys.modules,
+}}))
+"""
+
+def _time_command(argv: List[str], runs: int, cwd: str) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def probe(root: str = ROOT) -> Dict[str, object]:
+    """在新的直譯器中檢查 import 副作用與 --help 載入的模組"""
+    result = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+                            cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+def check(runs: int = 10, budget_ms: float = DEFAULT_BUDGET_MS, root: str = ROOT) -> Dict[str, object]:
+    """
+    量測啟動時間並執行 import 檢查
+
+    Returns:
+        報告（failures 為空代表通過）
+    """
+    checks = probe(root)
+
+    bare = _time_command([sys.executable, "-c", "pass"], runs, root)
+    timings: Dict[str, List[float]] = {
+        "help": _time_command([sys.executable, "main.py", "--help"], runs, root),
+        "history": _time_command([sys.executable, "main.py", "history", "--limit", "1"], runs, root),
+    }
+
+    baseline = statistics.median(bare)
+    overhead = {name: round((statistics.median(s) - baseline) * 1000, 1) for name, s in timings.items()}
+    failures = []
+    if checks["heavy_after_import_main"]:
+        failures.append(f"import main loaded heavy modules: {checks['heavy_after_import_main']}")
+    if checks["heavy_after_help"]:
+        failures.append(f"main.py --help loaded heavy modules: {checks['heavy_after_help']}")
+    if checks["sys_path_changed"]:
+        failures.append("import image.client.client modified sys.path")
+    if checks["output_dir_created"]:
+        failures.append("import image.client.client created output/")
+    if checks["pb_loaded_by_client_import"]:
+        failures.append("import image.client.client loaded the protobuf stubs")
+    if overhead["help"] > budget_ms:
+        failures.append(f"main.py --help overhead {overhead['help']}ms > budget {budget_ms}ms")
+
+    return {
+        "interpreter_ms": round(baseline * 1000, 1),
+        "overhead_ms": overhead,
+        "budget_ms": budget_ms,
+        "checks": checks,
+        "failures": failures,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Guard main.py startup time and import side effects")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="`main.py --help` 扣掉直譯器本身啟動後的中位數上限")
+    args = parser.parse_args(argv)
+
+    report = check(args.runs, args.budget_ms)
+    print(json.dumps(report, indent=2))
+    return 1 if report["failures"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Benchmark statistics
+Latency percentile summaries shared by the bench scripts
+"""
+import math
+from typing import Dict, List
+
+def percentile(ordered: List[float], p: float) -> float:
+    """nearest-rank 百分位；ordered 必須已排序"""
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+    return ordered[idx]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """將秒數樣本整理為毫秒的 p50 / p95 / p99 / mean / max"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
@@ -1,82 +1,436 @@
+import hashlib
 import os
+import queue
 import sys
+import threading
+import time
 import grpc
-import requests
 import urllib.parse
-from typing import List, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-# 讓 Python 找到 image_pb2
-sys.path.append(os.path.dirname(__file__))
+from image.client.replicas import ReplicaPool, addresses_from_env
+from image.client.transcode import (
+    DEFAULT_FORMATS,
+    DEFAULT_QUALITY,
+    normalize_format,
+    normalize_formats,
+    transcode_image,
+)
+from utils import metrics, tracing
 
-import image_pb2
-import image_pb2_grpc
-
-# 根目錄 output/
+# 根目錄 output/（第一次寫入時才建立）
 OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "output"))
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# client 端轉檔（server 不支援的格式，例如 webp）使用的 worker 數
+TRANSCODE_WORKERS = min(4, os.cpu_count() or 1)
+
+# 這些錯誤代表 replica 暫時無法服務，移出後改送下一個 replica
+FAILOVER_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+# 排程優先序（越大越優先）：server 以 priority queue 分配 OpenAI worker，等待越久優先序越高避免餓死
+PRIORITY_INTERACTIVE = 10   # 有人正在等的請求（審核時重產、CLI 產圖）
+PRIORITY_BATCH = 0          # 一般批次產圖（舊版 client 未帶 priority 時也是 0）
+PRIORITY_BACKGROUND = -10   # 預先產圖
+
+# 預先產圖等背景請求只使用 server 的閒置額度，額度不足時 server 回傳 RESOURCE_EXHAUSTED
+BACKGROUND_METADATA = (("x-request-class", "background"),)
+# 要求 server 略過快取重新產圖（審核時按 R）
+REFRESH_METADATA = (("x-cache-control", "refresh"),)
+
+RPC_SECONDS = metrics.histogram("image_rpc_seconds", "Image server RPC latency by method and replica")
+RPC_ERRORS = metrics.counter("image_rpc_errors_total", "Failed image server RPCs by method, replica and status code")
+HEDGES = metrics.counter("image_hedges_total", "Hedged GenerateImage requests sent to a second replica")
+CACHE_LOOKUPS = metrics.counter("image_cache_total", "Local output/ cache lookups by result (hit / miss)")
+BYTES_WRITTEN = metrics.counter("image_bytes_written_total", "Image bytes written to output/")
+TRANSCODE_SECONDS = metrics.histogram("image_transcode_seconds", "Client-side transcode latency by target format")
+
+_pool: Optional[ReplicaPool] = None
+_pool_lock = threading.Lock()
+_pb = None
+
+def stubs():
+    """
+    第一次使用時才載入生成的 protobuf 模組，回傳 (image_pb2, image_pb2_grpc)
+
+    生成的 image_pb2_grpc 以頂層 `import image_pb2` 引用，
+    先把 package 內的 image_pb2 註冊為頂層模組，不需要修改 sys.path。
+    """
+    global _pb
+    if _pb is None:
+        from image.client import image_pb2
+        sys.modules.setdefault("image_pb2", image_pb2)
+        from image.client import image_pb2_grpc
+        _pb = (image_pb2, image_pb2_grpc)
+    return _pb
+
+def get_replica_pool() -> ReplicaPool:
+    """取得共用的 replica pool（依 IMAGE_SERVER_ADDRESSES 建立，channel 會持續重用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ReplicaPool(addresses_from_env(), stubs()[1].ImageServiceStub)
+        return _pool
+
+def configure_servers(addresses: Sequence[str]) -> ReplicaPool:
+    """更新 image server 成員，只有受影響區段的 prompt 會換 replica"""
+    pool = get_replica_pool()
+    pool.set_addresses(addresses)
+    return pool
+
+def prompt_hash(prompt: str) -> str:
+    """與 Go server 相同的 prompt hash（sha1），用於路由與檔名"""
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+def cached_image(prompt: str, formats: Sequence[str] = DEFAULT_FORMATS) -> Optional[str]:
+    """回傳 output/ 中此 prompt 已存在的圖片（任一可接受格式），沒有時回傳 None"""
+    digest = prompt_hash(prompt)
+    for ext in normalize_formats(formats):
+        filepath = os.path.join(OUTPUT_DIR, f"{digest}.{ext}")
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
+def _hedged_call(key: str, invoke: Callable[[object], grpc.Future], method: str = "GenerateImage"):
+    """
+    依 consistent hashing 送出請求，並在主要 replica 過慢時送出 hedge
+
+    主要 replica 超過自身延遲百分位（預設 p95）仍未回應，且 hedge 額度足夠時，
+    同一個請求會再送給環上的下一個 replica；先成功者勝出，另一個請求會被取消。
+    replica 無法連線時移出並改送下一個 replica。
+
+    Returns:
+        (response, 勝出的 call)；call 可取得 trailing metadata
+    """
+    pool = get_replica_pool()
+    remaining = pool.candidates(key)
+    completed: "queue.Queue[grpc.Future]" = queue.Queue()
+    inflight: Dict[grpc.Future, Tuple[str, float]] = {}
+    last_error: Optional[grpc.RpcError] = None
+
+    def launch() -> bool:
+        while remaining:
+            address = remaining.pop(0)
+            if not pool.breaker(address).allow_request():
+                continue
+            future = invoke(pool.stub(address))
+            inflight[future] = (address, time.monotonic())
+            future.add_done_callback(completed.put)
+            return True
+        return False
+
+    pool.hedge_budget.on_request()
+    if not launch():
+        raise Exception("❌ 沒有可用的 image server")
+    primary, started = next(iter(inflight.values()))
+    hedge_delay = pool.hedge_delay(primary)
+    hedged = False
+
+    while inflight:
+        timeout = None
+        if not hedged and remaining and hedge_delay is not None:
+            timeout = max(0.0, started + hedge_delay - time.monotonic())
+        try:
+            future = completed.get(timeout=timeout)
+        except queue.Empty:
+            hedged = True
+            if pool.hedge_budget.try_spend() and launch():
+                HEDGES.inc()
+                print(f"🪁 {primary} 超過 p{int(pool.hedge_percentile * 100)}（{hedge_delay:.2f}s），送出 hedge 請求")
+            continue
+
+        address, sent_at = inflight.pop(future)
+        try:
+            response = future.result()
+        except grpc.RpcError as e:
+            pool.record_failure(address, e.code())
+            RPC_ERRORS.inc(method=method, replica=address, code=e.code().name)
+            last_error = e
+            if e.code() not in FAILOVER_CODES and not inflight:
+                raise
+            if e.code() in FAILOVER_CODES:
+                print(f"⚠️ image server {address} 無法使用（{e.code().name}），改送其他 replica")
+            if not inflight and launch():
+                # 接手的 replica 重新計算 hedge 門檻，不沿用失敗請求的起始時間
+                primary, started = next(iter(inflight.values()))
+                hedge_delay = pool.hedge_delay(primary)
+                hedged = False
+            continue
+
+        elapsed = time.monotonic() - sent_at
+        pool.record_success(address, elapsed)
+        RPC_SECONDS.observe(elapsed, method=method, replica=address)
+        for loser, (loser_address, _) in inflight.items():
+            loser.cancel()
+            pool.breaker(loser_address).release()
+        return response, future
+
+    raise last_error or Exception("❌ 沒有可用的 image server")
 
 def download_image_from_url(url: str) -> bytes:
+    import requests
+
     print(f"🌐 從 URL 下載圖片：{url}")
     decoded_url = urllib.parse.unquote(url)
     safe_url = urllib.parse.quote(decoded_url, safe=":/?&=%")
 
     try:
-        response = requests.get(safe_url)
+        with tracing.span("download"):
+            response = requests.get(safe_url)
         if response.status_code == 200:
             return response.content
         raise Exception(f"❌ 下載失敗，狀態碼：{response.status_code}")
     except Exception as e:
         raise Exception(f"❌ 請求 URL 錯誤：{safe_url}\n訊息：{e}")
 
-def generate_image(prompt: str) -> Tuple[str, str]:
-    with grpc.insecure_channel("localhost:50051") as channel:
-        stub = image_pb2_grpc.ImageServiceStub(channel)
-        request = image_pb2.ImageRequest(prompt=prompt)
-        response = stub.GenerateImage(request)
+def _resolve_file_type(file_type: str, formats: List[str]) -> Tuple[str, bool]:
+    """
+    決定最終儲存格式；回傳 (副檔名, 是否需要 client 端轉檔)
 
-        ext = response.file_type or "png"
-        filename = f"{response.prompt_hash}.{ext}"
-        filepath = os.path.join(OUTPUT_DIR, filename)
+    server 回傳無損的 png（例如不支援 webp 或舊版 server）時，在 client 端轉成首選格式；
+    已是可接受的有損格式則直接保留，避免二次壓縮。
+    """
+    file_type = normalize_format(file_type) or "png"
+    if file_type == formats[0]:
+        return file_type, False
+    if file_type != "png" and file_type in formats:
+        return file_type, False
+    return formats[0], True
 
-        if os.path.exists(filepath):
-            print(f"📦 快取命中：{filepath}")
+def _store_image(prompt_hash: str, image_data: bytes, file_type: str,
+                 formats: List[str], quality: int, overwrite: bool = False) -> str:
+    """將圖片寫入 output/，server 未產出可接受格式時在 client 端轉檔一次；overwrite 時覆蓋既有檔案"""
+    ext, needs_transcode = _resolve_file_type(file_type, formats)
+    filepath = os.path.join(OUTPUT_DIR, f"{prompt_hash}.{ext}")
+
+    if os.path.exists(filepath) and not overwrite:
+        CACHE_LOOKUPS.inc(result="hit")
+        print(f"📦 快取命中：{filepath}")
+        return filepath
+    CACHE_LOOKUPS.inc(result="miss")
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if needs_transcode:
+        with TRANSCODE_SECONDS.time(format=ext), tracing.span("transcode", format=ext):
+            image_data = transcode_image(image_data, ext, quality)
+
+    with tracing.span("store", bytes=len(image_data)), open(filepath, "wb") as f:
+        f.write(image_data)
+    BYTES_WRITTEN.inc(len(image_data))
+    print(f"✅ 圖片已儲存：{filepath}")
+    return filepath
+
+def generate_image(prompt: str, formats: Sequence[str] = DEFAULT_FORMATS,
+                   quality: int = DEFAULT_QUALITY, priority: int = PRIORITY_BATCH,
+                   refresh: bool = False) -> Tuple[str, str]:
+    """
+    產生單張圖片並儲存至 output 資料夾
+
+    Args:
+        priority: server 排程優先序（PRIORITY_*）
+        refresh: 重新產圖並覆蓋既有檔案（審核時按 R），不使用本地與 server 快取
+    """
+    formats = normalize_formats(formats)
+    # 已預先產生（或先前產生過）的圖片直接沿用，不送出 RPC
+    cached = None if refresh else cached_image(prompt, formats)
+    if cached:
+        CACHE_LOOKUPS.inc(result="hit")
+        print(f"📦 快取命中：{cached}")
+        return cached, prompt_hash(prompt)
+
+    image_pb2, _ = stubs()
+    request = image_pb2.ImageRequest(prompt=prompt, accept_formats=formats, quality=quality, priority=priority)
+    trace_id = tracing.current_trace_id()
+    metadata = tracing.grpc_metadata([trace_id])
+    if refresh:
+        metadata += REFRESH_METADATA
+
+    start = tracing.now()
+    response, call = _hedged_call(prompt_hash(prompt),
+                                  lambda stub: stub.GenerateImage.future(request, metadata=metadata))
+    end = tracing.now()
+    tracing.add_span("generate", start, end, trace_id)
+    tracing.record_server_timing(call.trailing_metadata(), start, end, trace_id)
+
+    ext, _ = _resolve_file_type(response.file_type, formats)
+    filepath = os.path.join(OUTPUT_DIR, f"{response.prompt_hash}.{ext}")
+
+    if os.path.exists(filepath) and not refresh:
+        CACHE_LOOKUPS.inc(result="hit")
+        print(f"📦 快取命中：{filepath}")
+    else:
+        if response.image_data:
+            image_data = response.image_data
+        elif response.image_url:
+            image_data = download_image_from_url(response.image_url)
         else:
-            if response.image_data:
-                image_data = response.image_data
-            elif response.image_url:
-                image_data = download_image_from_url(response.image_url)
+            raise Exception("❌ 沒有圖片資料")
+
+        filepath = _store_image(response.prompt_hash, image_data, response.file_type, formats, quality,
+                                overwrite=refresh)
+
+    return filepath, response.prompt_hash
+
+def _call_batch(address: str, request, trace_ids: Dict[str, Optional[str]],
+                background: bool = False) -> Tuple[object, int]:
+    """
+    送出一組 GenerateBatch，記錄該 replica 的延遲與各筆記的 span
+
+    Returns:
+        (response, server 快取命中數)；命中數取自 x-cache-hits trailer，舊版 server 沒有時為 0
+    """
+    metadata = tracing.grpc_metadata([trace_ids.get(prompt) for prompt in request.prompts])
+    if background:
+        metadata += BACKGROUND_METADATA
+    start = tracing.now()
+    with RPC_SECONDS.time(method="GenerateBatch", replica=address):
+        response, call = get_replica_pool().stub(address).GenerateBatch.with_call(request, metadata=metadata)
+    end = tracing.now()
+    trailers = call.trailing_metadata() or ()
+
+    if tracing.enabled():
+        by_hash = {}
+        for prompt in request.prompts:
+            trace_id = trace_ids.get(prompt)
+            tracing.add_span("generate", start, end, trace_id, replica=address, batch=len(request.prompts))
+            if trace_id:
+                by_hash[prompt_hash(prompt)] = trace_id
+        tracing.record_server_timing(trailers, start, end, trace_ids=by_hash)
+    try:
+        hits = int(dict(trailers).get("x-cache-hits", 0))
+    except ValueError:
+        hits = 0
+    return response, hits
+
+def _generate_sharded(prompts: List[str], formats: List[str], quality: int,
+                      trace_ids: Dict[str, Optional[str]], background: bool = False,
+                      priority: int = PRIORITY_BATCH) -> Tuple[list, int, Optional[Exception]]:
+    """
+    依主要 replica 分組後平行送出 GenerateBatch，回傳 (items, server 快取命中數, 錯誤)，失敗的分組移出 replica 後重新分派
+
+    與單張請求相同經過 circuit breaker：每個分組是一個請求，半開的 replica 只放行一個試探分組，
+    其餘 prompt 改送環上的下一個 replica；本次已失敗的 replica 不再重送。
+    遇到無法改送的錯誤時停止分派，連同已完成分組的 items 一起回傳，由呼叫端先存檔再拋出。
+    """
+    pool = get_replica_pool()
+    image_pb2, _ = stubs()
+    pending = list(prompts)
+    items = []
+    server_hits = 0
+    failed = set()
+    last_error: Optional[grpc.RpcError] = None
+    fatal: Optional[grpc.RpcError] = None
+
+    for _ in range(len(pool.addresses) + 1):
+        if not pending:
+            break
+        groups: Dict[str, List[str]] = defaultdict(list)
+        allowed: Dict[str, bool] = {}
+        unrouted = []
+        for prompt in pending:
+            for address in pool.candidates(prompt_hash(prompt)):
+                if address in failed:
+                    continue
+                if address not in allowed:
+                    allowed[address] = pool.breaker(address).allow_request()
+                if allowed[address]:
+                    groups[address].append(prompt)
+                    break
             else:
-                raise Exception("❌ 沒有圖片資料")
+                unrouted.append(prompt)
+        pending = unrouted
+        if not groups:
+            break
 
-            with open(filepath, "wb") as f:
-                f.write(image_data)
-            print(f"✅ 圖片已儲存：{filepath}")
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = {
+                address: executor.submit(
+                    _call_batch,
+                    address,
+                    image_pb2.BatchRequest(prompts=group, accept_formats=formats, quality=quality,
+                                           priority=priority),
+                    trace_ids,
+                    background,
+                )
+                for address, group in groups.items()
+            }
+            # 先收齊每個分組的結果並回報斷路狀態（釋放試探名額），再拋出無法改送的錯誤
+            for address, future in futures.items():
+                try:
+                    response, hits = future.result()
+                except grpc.RpcError as e:
+                    pool.record_failure(address, e.code())
+                    RPC_ERRORS.inc(method="GenerateBatch", replica=address, code=e.code().name)
+                    if e.code() not in FAILOVER_CODES:
+                        fatal = fatal or e
+                        continue
+                    print(f"⚠️ image server {address} 無法使用（{e.code().name}），改送其他 replica")
+                    pending.extend(groups[address])
+                    failed.add(address)
+                    last_error = e
+                else:
+                    items.extend(response.items)
+                    server_hits += hits
+                    pool.record_success(address)
+        if fatal is not None:
+            return items, server_hits, fatal
 
-        return filepath, response.prompt_hash
+    if pending:
+        return items, server_hits, last_error or Exception("❌ 沒有可用的 image server")
+    return items, server_hits, None
 
-def generate_batch(prompts: List[str]) -> List[Tuple[str, str, str]]:
-    """批次產圖並儲存至 output 資料夾"""
-    with grpc.insecure_channel("localhost:50051") as channel:
-        stub = image_pb2_grpc.ImageServiceStub(channel)
-        request = image_pb2.BatchRequest(prompts=prompts)
-        response = stub.GenerateBatch(request)
+def generate_batch(prompts: List[str], formats: Sequence[str] = DEFAULT_FORMATS,
+                   quality: int = DEFAULT_QUALITY,
+                   trace_ids: Optional[Sequence[Optional[str]]] = None,
+                   background: bool = False, priority: int = PRIORITY_BATCH,
+                   stats: Optional[Dict[str, int]] = None) -> List[Tuple[str, str, str]]:
+    """
+    批次產圖並儲存至 output 資料夾
 
-    output_dir = os.path.join(os.path.dirname(__file__), "..", "..", "output")
-    os.makedirs(output_dir, exist_ok=True)
+    Args:
+        trace_ids: 與 prompts 對應的 trace id（每篇筆記一個），預設沿用目前的 trace
+        background: 以背景請求送出，只使用 server 的閒置額度（額度不足時拋出 RESOURCE_EXHAUSTED）
+        priority: server 排程優先序（PRIORITY_*）
+        stats: 傳入 dict 時寫入 local_hits（output/ 命中）、server_hits（server 快取命中）
+               與 generated（實際呼叫 OpenAI 的張數）
 
-    results = []
+    Returns:
+        依輸入順序的 (prompt_hash, prompt, filepath)；output/ 已有的圖片不會送出 RPC
+    """
+    formats = normalize_formats(formats)
+    if trace_ids is None:
+        trace_ids = [tracing.current_trace_id()] * len(prompts)
+    trace_by_prompt = dict(zip(prompts, trace_ids))
 
-    for item in response.items:
-        filename = f"{item.prompt_hash}.{item.file_type or 'png'}"
-        filepath = os.path.join(output_dir, filename)
+    results: Dict[str, Tuple[str, str, str]] = {}
+    for prompt in dict.fromkeys(prompts):
+        cached = cached_image(prompt, formats)
+        if cached:
+            CACHE_LOOKUPS.inc(result="hit")
+            results[prompt] = (prompt_hash(prompt), prompt, cached)
+    if results:
+        print(f"📦 快取命中 {len(results)} 張，不重新產圖")
 
-        if os.path.exists(filepath):
-            print(f"📦 快取命中：{filepath}")
-        else:
-            with open(filepath, "wb") as f:
-                f.write(item.image_data)
-            print(f"✅ 圖片已儲存：{filepath}")
+    missing = [prompt for prompt in dict.fromkeys(prompts) if prompt not in results]
+    items, server_hits, error = (_generate_sharded(missing, formats, quality, trace_by_prompt, background, priority)
+                                 if missing else ([], 0, None))
+    if stats is not None:
+        stats.update(local_hits=len(results), server_hits=server_hits,
+                     generated=max(0, len(items) - server_hits))
 
-        results.append((item.prompt_hash, item.prompt, filepath))
+    # 轉檔 / 寫檔交給 worker pool，PIL 編碼時會釋放 GIL
+    with ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS) as pool:
+        futures = [
+            pool.submit(tracing.call_with_trace, trace_by_prompt.get(item.prompt),
+                        _store_image, item.prompt_hash, item.image_data, item.file_type, formats, quality)
+            for item in items
+        ]
+        for item, future in zip(items, futures):
+            results[item.prompt] = (item.prompt_hash, item.prompt, future.result())
+    # 部分分組失敗時，已完成的圖片先存進 output/，重試時直接命中本地快取
+    if error is not None:
+        raise error
 
-    return results
\ No newline at end of file
+    # 各 replica 回傳順序不固定，依輸入順序排列（server 可能略過產圖失敗的項目）
+    return [results[prompt] for prompt in prompts if prompt in results]
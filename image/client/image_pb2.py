@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bimage.proto\x12\x05image\"\x1e\n\x0cImageRequest\x12\x0e\n\x06prompt\x18\x01 \x01(\t\"^\n\rImageResponse\x12\x12\n\nimage_data\x18\x01 \x01(\x0c\x12\x13\n\x0bprompt_hash\x18\x02 \x01(\t\x12\x11\n\tfile_type\x18\x03 \x01(\t\x12\x11\n\timage_url\x18\x04 \x01(\t\"\x1f\n\x0c\x42\x61tchRequest\x12\x0f\n\x07prompts\x18\x01 \x03(\t\"f\n\tBatchItem\x12\x0e\n\x06prompt\x18\x01 \x01(\t\x12\x13\n\x0bprompt_hash\x18\x02 \x01(\t\x12\x12\n\nimage_data\x18\x03 \x01(\x0c\x12\x11\n\tfile_type\x18\x04 \x01(\t\x12\r\n\x05\x65rror\x18\x05 \x01(\t\"0\n\rBatchResponse\x12\x1f\n\x05items\x18\x01 \x03(\x0b\x32\x10.image.BatchItem2\x86\x01\n\x0cImageService\x12:\n\rGenerateImage\x12\x13.image.ImageRequest\x1a\x14.image.ImageResponse\x12:\n\rGenerateBatch\x12\x13.image.BatchRequest\x1a\x14.image.BatchResponseB\x06Z\x04./pbb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bimage.proto\x12\x05image\"Y\n\x0cImageRequest\x12\x0e\n\x06prompt\x18\x01 \x01(\t\x12\x16\n\x0e\x61\x63\x63\x65pt_formats\x18\x02 \x03(\t\x12\x0f\n\x07quality\x18\x03 \x01(\x05\x12\x10\n\x08priority\x18\x04 \x01(\x05\"^\n\rImageResponse\x12\x12\n\nimage_data\x18\x01 \x01(\x0c\x12\x13\n\x0bprompt_hash\x18\x02 \x01(\t\x12\x11\n\tfile_type\x18\x03 \x01(\t\x12\x11\n\timage_url\x18\x04 \x01(\t\"Z\n\x0c\x42\x61tchRequest\x12\x0f\n\x07prompts\x18\x01 \x03(\t\x12\x16\n\x0e\x61\x63\x63\x65pt_formats\x18\x02 \x03(\t\x12\x0f\n\x07quality\x18\x03 \x01(\x05\x12\x10\n\x08priority\x18\x04 \x01(\x05\"f\n\tBatchItem\x12\x0e\n\x06prompt\x18\x01 \x01(\t\x12\x13\n\x0bprompt_hash\x18\x02 \x01(\t\x12\x12\n\nimage_data\x18\x03 \x01(\x0c\x12\x11\n\tfile_type\x18\x04 \x01(\t\x12\r\n\x05\x65rror\x18\x05 \x01(\t\"0\n\rBatchResponse\x12\x1f\n\x05items\x18\x01 \x03(\x0b\x32\x10.image.BatchItem2\x86\x01\n\x0cImageService\x12:\n\rGenerateImage\x12\x13.image.ImageRequest\x1a\x14.image.ImageResponse\x12:\n\rGenerateBatch\x12\x13.image.BatchRequest\x1a\x14.image.BatchResponseB\x06Z\x04./pbb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,15 +33,15 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z\004./pb'
   _globals['_IMAGEREQUEST']._serialized_start=22
-  _globals['_IMAGEREQUEST']._serialized_end=52
-  _globals['_IMAGERESPONSE']._serialized_start=54
-  _globals['_IMAGERESPONSE']._serialized_end=148
-  _globals['_BATCHREQUEST']._serialized_start=150
-  _globals['_BATCHREQUEST']._serialized_end=181
-  _globals['_BATCHITEM']._serialized_start=183
-  _globals['_BATCHITEM']._serialized_end=285
-  _globals['_BATCHRESPONSE']._serialized_start=287
-  _globals['_BATCHRESPONSE']._serialized_end=335
-  _globals['_IMAGESERVICE']._serialized_start=338
-  _globals['_IMAGESERVICE']._serialized_end=472
+  _globals['_IMAGEREQUEST']._serialized_end=111
+  _globals['_IMAGERESPONSE']._serialized_start=113
+  _globals['_IMAGERESPONSE']._serialized_end=207
+  _globals['_BATCHREQUEST']._serialized_start=209
+  _globals['_BATCHREQUEST']._serialized_end=299
+  _globals['_BATCHITEM']._serialized_start=301
+  _globals['_BATCHITEM']._serialized_end=403
+  _globals['_BATCHRESPONSE']._serialized_start=405
+  _globals['_BATCHRESPONSE']._serialized_end=453
+  _globals['_IMAGESERVICE']._serialized_start=456
+  _globals['_IMAGESERVICE']._serialized_end=590
 # @@protoc_insertion_point(module_scope)
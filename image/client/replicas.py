@@ -0,0 +1,186 @@
+"""
+Replica pool
+Keeps one warm gRPC channel per image server replica, tracks its latency and ejects replicas that keep failing
+"""
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import grpc
+
+from image.client.resilience import CircuitBreaker, HedgeBudget, LatencyTracker
+from image.client.sharding import DEFAULT_VNODES, HashRing
+
+DEFAULT_ADDRESS = "localhost:50051"
+# 被移出的 replica 多久後重新嘗試
+DEFAULT_EJECT_SECONDS = 30.0
+# 連續失敗幾次後斷路
+DEFAULT_FAILURE_THRESHOLD = 3
+# 超過主要 replica 的第幾百分位延遲時送出 hedge
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# hedge 額度：最多多送主要請求的 10%
+DEFAULT_HEDGE_RATIO = 0.1
+# 計入斷路的狀態碼（replica 本身的問題）；UNAVAILABLE 另外處理，直接斷路
+BREAKER_CODES = (grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.INTERNAL)
+
+def addresses_from_env() -> List[str]:
+    """讀取 IMAGE_SERVER_ADDRESSES（逗號分隔），未設定時使用單一本機 server"""
+    raw = os.environ.get("IMAGE_SERVER_ADDRESSES", "")
+    addresses = [a.strip() for a in raw.split(",") if a.strip()]
+    return addresses or [DEFAULT_ADDRESS]
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+class ReplicaPool:
+    """Routes keys to replicas by consistent hashing and tracks replica health and latency"""
+
+    def __init__(self, addresses: Iterable[str], stub_factory: Callable[[grpc.Channel], object],
+                 eject_seconds: float = DEFAULT_EJECT_SECONDS, vnodes: int = DEFAULT_VNODES,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 hedge_percentile: Optional[float] = None, hedge_ratio: Optional[float] = None):
+        """
+        Args:
+            addresses: server 位址清單
+            stub_factory: 由 channel 建立 stub 的函式（例如 ImageServiceStub）
+            eject_seconds: replica 被移出（斷路）後的冷卻時間
+            vnodes: 每個 replica 的虛擬節點數
+            failure_threshold: 連續失敗幾次後斷路
+            hedge_percentile: 超過此百分位延遲時送出 hedge（預設讀 IMAGE_HEDGE_PERCENTILE）
+            hedge_ratio: hedge 額度比例，0 代表停用（預設讀 IMAGE_HEDGE_RATIO）
+        """
+        self.stub_factory = stub_factory
+        self.eject_seconds = eject_seconds
+        self.failure_threshold = failure_threshold
+        self.hedge_percentile = (hedge_percentile if hedge_percentile is not None
+                                 else _float_env("IMAGE_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE))
+        self.hedge_budget = HedgeBudget(hedge_ratio if hedge_ratio is not None
+                                        else _float_env("IMAGE_HEDGE_RATIO", DEFAULT_HEDGE_RATIO))
+        self.ring = HashRing(vnodes=vnodes)
+        self._lock = threading.Lock()
+        self._channels: Dict[str, grpc.Channel] = {}
+        self._stubs: Dict[str, object] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.set_addresses(addresses)
+
+    @property
+    def addresses(self) -> List[str]:
+        return self.ring.nodes
+
+    def set_addresses(self, addresses: Iterable[str]) -> None:
+        """更新成員；consistent hashing 只會搬移新增 / 移除節點附近的 key"""
+        addresses = list(dict.fromkeys(addresses))
+        for address in self.ring.nodes:
+            if address not in addresses:
+                self.ring.remove_node(address)
+                self._close(address)
+        for address in addresses:
+            self.ring.add_node(address)
+
+    def stub(self, address: str):
+        """取得（並快取）指定 replica 的 stub，channel 會保持連線供後續重用"""
+        with self._lock:
+            stub = self._stubs.get(address)
+            if stub is None:
+                channel = grpc.insecure_channel(address)
+                self._channels[address] = channel
+                stub = self.stub_factory(channel)
+                self._stubs[address] = stub
+            return stub
+
+    def candidates(self, key: str) -> List[str]:
+        """
+        依環上順序回傳可嘗試的 replica，主要 replica 在前
+
+        被移出且仍在冷卻中的 replica 會被略過；若全部都被移出則回傳完整清單，
+        讓呼叫端仍有機會成功。
+        """
+        ordered = self.ring.get_nodes(key, len(self.ring.nodes))
+        healthy = [a for a in ordered if not self.is_ejected(a)]
+        return healthy or ordered
+
+    def primary(self, key: str) -> Optional[str]:
+        candidates = self.candidates(key)
+        return candidates[0] if candidates else None
+
+    def breaker(self, address: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(address)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.eject_seconds)
+                self._breakers[address] = breaker
+            return breaker
+
+    def latency(self, address: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._latency.get(address)
+            if tracker is None:
+                tracker = LatencyTracker()
+                self._latency[address] = tracker
+            return tracker
+
+    def hedge_delay(self, address: str) -> Optional[float]:
+        """主要 replica 的 hedge 門檻（秒）；樣本不足時回傳 None，不做 hedge"""
+        return self.latency(address).percentile(self.hedge_percentile)
+
+    def record_success(self, address: str, seconds: Optional[float] = None) -> None:
+        self.breaker(address).record_success()
+        if seconds is not None:
+            self.latency(address).record(seconds)
+
+    def record_failure(self, address: str, code: Optional[grpc.StatusCode] = None) -> None:
+        """
+        連線被拒（UNAVAILABLE）直接斷路，逾時與 server 內部錯誤累計到門檻才斷路
+
+        其他狀態碼是單一請求的應用層錯誤（例如 handler 把 OpenAI 的錯誤回成 UNKNOWN），
+        replica 本身正常回應，不計入斷路，只釋放半開狀態的試探名額。
+        """
+        if code == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            # server 主動拒絕（背景請求沒有閒置額度）代表 replica 正常，不計入斷路
+            self.breaker(address).record_success()
+        elif code == grpc.StatusCode.UNAVAILABLE:
+            self.eject(address)
+        elif code in BREAKER_CODES:
+            self.breaker(address).record_failure()
+        else:
+            self.breaker(address).release()
+
+    def eject(self, address: str) -> None:
+        """暫時移出 replica（斷路），冷卻結束後以試探請求重新加入"""
+        self.breaker(address).trip()
+
+    def restore(self, address: str) -> None:
+        self.breaker(address).reset()
+
+    def is_ejected(self, address: str) -> bool:
+        return self.breaker(address).is_open()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """各 replica 的斷路狀態與延遲百分位，方便觀察與除錯"""
+        result = {}
+        for address in self.ring.nodes:
+            tracker = self.latency(address)
+            result[address] = {
+                "state": self.breaker(address).state,
+                "samples": len(tracker),
+                "p50": tracker.percentile(0.5),
+                "p95": tracker.percentile(0.95),
+            }
+        return result
+
+    def close(self) -> None:
+        for address in list(self._channels):
+            self._close(address)
+
+    def _close(self, address: str) -> None:
+        with self._lock:
+            channel = self._channels.pop(address, None)
+            self._stubs.pop(address, None)
+            self._breakers.pop(address, None)
+            self._latency.pop(address, None)
+        if channel is not None:
+            channel.close()
@@ -0,0 +1,148 @@
+"""
+Replica resilience
+Per-replica latency percentiles, circuit breaking and a budget for hedged requests
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+class LatencyTracker:
+    """Sliding window of recent latencies for one replica"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Args:
+            window: 保留最近幾筆延遲
+            min_samples: 樣本數不足時不提供百分位數（避免過早 hedge）
+        """
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """回傳第 p 百分位（0-1），樣本不足時回傳 None"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+        return ordered[idx]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class CircuitBreaker:
+    """Stops sending to a replica after repeated failures, then probes it again"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: 連續失敗幾次後斷路
+            reset_seconds: 斷路後多久允許一個試探請求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def is_open(self) -> bool:
+        """是否應略過此 replica（不會消耗試探名額）"""
+        with self._lock:
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at < self.reset_seconds
+            if self._state == self.HALF_OPEN:
+                return self._probe_inflight
+            return False
+
+    def allow_request(self) -> bool:
+        """實際送出前呼叫；半開狀態下只放行一個試探請求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probe_inflight:
+                return False
+            self._probe_inflight = True
+            return True
+
+    def release(self) -> None:
+        """請求被取消（例如 hedge 落敗）時歸還試探名額，不改變狀態"""
+        with self._lock:
+            self._probe_inflight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_inflight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_inflight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip_locked()
+
+    def trip(self) -> None:
+        """立即斷路（例如連線被拒）"""
+        with self._lock:
+            self._trip_locked()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_inflight = False
+
+    def _trip_locked(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_inflight = False
+
+class HedgeBudget:
+    """Caps hedged duplicates to a fraction of primary requests"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3.0):
+        """
+        Args:
+            ratio: 每個主要請求累積的 hedge 額度（0.1 代表最多多送 10%）
+            burst: 額度上限，避免閒置後一次大量 hedge
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst if ratio > 0 else 0.0
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def on_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            self.sent += 1
+            return True
@@ -0,0 +1,80 @@
+"""
+Consistent hashing
+Routes prompt hashes to image server replicas so each prompt keeps hitting the same server cache
+"""
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List
+
+# 每個實體節點在環上的虛擬節點數，越多分佈越平均
+DEFAULT_VNODES = 160
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        """
+        Args:
+            nodes: 初始節點（server 位址）
+            vnodes: 每個節點的虛擬節點數
+        """
+        self.vnodes = vnodes
+        self._lock = threading.Lock()
+        self._ring: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add_node(self, node: str) -> None:
+        """加入節點；只有落在新節點區段的 key 會移動"""
+        with self._lock:
+            if node in self._nodes:
+                return
+            self._nodes.append(node)
+            for i in range(self.vnodes):
+                point = _hash(f"{node}#{i}")
+                if point in self._owners:
+                    continue
+                self._owners[point] = node
+                bisect.insort(self._ring, point)
+
+    def remove_node(self, node: str) -> None:
+        """移除節點；只有原本屬於該節點的 key 會移動"""
+        with self._lock:
+            if node not in self._nodes:
+                return
+            self._nodes.remove(node)
+            self._ring = [p for p in self._ring if self._owners[p] != node]
+            self._owners = {p: n for p, n in self._owners.items() if n != node}
+
+    def get_node(self, key: str) -> str:
+        """取得 key 的主要節點"""
+        nodes = self.get_nodes(key, 1)
+        if not nodes:
+            raise LookupError("hash ring 沒有任何節點")
+        return nodes[0]
+
+    def get_nodes(self, key: str, count: int) -> List[str]:
+        """沿著環順時針取得 count 個不重複節點（主要節點在前，其餘作為備援）"""
+        with self._lock:
+            if not self._ring:
+                return []
+            count = min(count, len(self._nodes))
+            idx = bisect.bisect(self._ring, _hash(key)) % len(self._ring)
+            result: List[str] = []
+            for offset in range(len(self._ring)):
+                node = self._owners[self._ring[(idx + offset) % len(self._ring)]]
+                if node not in result:
+                    result.append(node)
+                    if len(result) == count:
+                        break
+            return result
@@ -0,0 +1,68 @@
+"""
+Image transcoding helpers
+Converts generated images into the compressed formats the client accepts
+"""
+import io
+from typing import Iterable, List
+
+# 依偏好排序：照片類內容 webp / jpeg 通常比 png 小好幾倍
+DEFAULT_FORMATS = ("webp", "jpeg", "png")
+DEFAULT_QUALITY = 85
+
+# file_type -> PIL format 名稱
+_PIL_FORMATS = {
+    "png": "PNG",
+    "jpeg": "JPEG",
+    "webp": "WEBP",
+}
+
+def normalize_format(fmt: str) -> str:
+    """統一格式名稱，例如 'JPG' -> 'jpeg'"""
+    fmt = (fmt or "").strip().lower()
+    return "jpeg" if fmt == "jpg" else fmt
+
+def normalize_formats(formats: Iterable[str]) -> List[str]:
+    """過濾不支援的格式並去除重複，保留原本的偏好順序"""
+    result = []
+    for fmt in formats:
+        fmt = normalize_format(fmt)
+        if fmt in _PIL_FORMATS and fmt not in result:
+            result.append(fmt)
+    return result or ["png"]
+
+def transcode_image(data: bytes, target: str, quality: int = DEFAULT_QUALITY) -> bytes:
+    """
+    將圖片轉成指定格式
+
+    Args:
+        data: 原始圖片 bytes（任何 PIL 可讀取的格式）
+        target: 目標格式（png / jpeg / webp）
+        quality: 有損格式的品質（1-100）
+
+    Returns:
+        轉檔後的圖片 bytes
+    """
+    from PIL import Image
+
+    target = normalize_format(target)
+    img = Image.open(io.BytesIO(data))
+
+    params = {}
+    if target == "jpeg":
+        # JPEG 沒有 alpha，先鋪白底
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        params = {"quality": quality, "optimize": True}
+    elif target == "webp":
+        params = {"quality": quality, "method": 4}
+    elif target == "png":
+        params = {"optimize": True}
+
+    buf = io.BytesIO()
+    img.save(buf, format=_PIL_FORMATS[target], **params)
+    return buf.getvalue()
@@ -0,0 +1,73 @@
+package main
+
+import (
+	"context"
+	"log"
+	"os"
+	"strconv"
+
+	"google.golang.org/grpc/codes"
+	"google.golang.org/grpc/metadata"
+	"google.golang.org/grpc/status"
+)
+
+// 預先產圖等背景請求以 metadata x-request-class: background 標示，
+// 只使用前景請求沒用到的 OpenAI 額度；額度不足時回傳 ResourceExhausted，由 client 稍後再試。
+const (
+	requestClassHeader = "x-request-class"
+	backgroundClass    = "background"
+)
+
+// Quota 共用一個 token bucket：前景請求一律放行但會扣額度，背景請求必須保留 reserve 個 token
+type Quota struct {
+	limiter *TokenBucketLimiter
+	reserve float64
+}
+
+// NewQuotaFromEnv 依 IMAGE_RATE_LIMIT_PER_MINUTE（預設 50）與
+// IMAGE_BACKGROUND_RESERVE（保留給前景的 bucket 比例，預設 0.2）建立額度
+func NewQuotaFromEnv() *Quota {
+	perMinute := 50
+	if v, err := strconv.Atoi(os.Getenv("IMAGE_RATE_LIMIT_PER_MINUTE")); err == nil && v > 0 {
+		perMinute = v
+	}
+	reserveRatio := 0.2
+	if v, err := strconv.ParseFloat(os.Getenv("IMAGE_BACKGROUND_RESERVE"), 64); err == nil && v >= 0 && v <= 1 {
+		reserveRatio = v
+	}
+
+	limiter := NewTokenBucketLimiter(float64(perMinute)/60.0, float64(perMinute)/6.0)
+	return &Quota{limiter: limiter, reserve: limiter.capacity * reserveRatio}
+}
+
+// hasMetadata 判斷 client 是否在 metadata 帶了 key: value
+func hasMetadata(ctx context.Context, key, value string) bool {
+	md, ok := metadata.FromIncomingContext(ctx)
+	if !ok {
+		return false
+	}
+	for _, v := range md.Get(key) {
+		if v == value {
+			return true
+		}
+	}
+	return false
+}
+
+// isBackground 判斷請求是否為背景請求
+func isBackground(ctx context.Context) bool {
+	return hasMetadata(ctx, requestClassHeader, backgroundClass)
+}
+
+// Admit 為 n 張圖片扣除額度；背景請求額度不足時回傳 ResourceExhausted
+func (q *Quota) Admit(ctx context.Context, n int) error {
+	if !isBackground(ctx) {
+		q.limiter.Take(float64(n))
+		return nil
+	}
+	if !q.limiter.TakeIfAbove(float64(n), q.reserve) {
+		log.Printf("⏸️ 背景請求略過：閒置額度不足（%d 張）", n)
+		return status.Error(codes.ResourceExhausted, "no idle quota for background generation")
+	}
+	return nil
+}
@@ -1,126 +1,420 @@
 package main
 
 import (
+	"container/list"
+	"context"
+	"hash/fnv"
+	"log"
+	"os"
+	"path/filepath"
+	"sort"
+	"strconv"
+	"strings"
 	"sync"
+	"sync/atomic"
 	"time"
+
+	"google.golang.org/grpc"
+	"google.golang.org/grpc/metadata"
+)
+
+// 以 prompt hash 快取 OpenAI 回傳的原始圖片（轉檔前），同一個 prompt 不再重複呼叫 OpenAI。
+//
+//	記憶體：LRUCache，依 byte 預算淘汰最久未使用的圖片，分成多個 shard 各自上鎖，TTL 於讀取時檢查
+//	磁碟：DiskCache，<dir>/<hash 前兩碼>/<hash>.img，server 重啟後仍有效，超過 byte 預算時刪除最久未讀取的檔案
+//
+// client 以 metadata x-cache-control: refresh 要求重新產圖（審核時按 R），新圖片會覆蓋快取。
+// 回應以 trailer 標示是否命中：GenerateImage 為 x-cache: hit / miss 與 x-cache-tier，GenerateBatch 為 x-cache-hits。
+const (
+	cacheControlHeader = "x-cache-control"
+	cacheRefresh       = "refresh"
+	cacheStatusHeader  = "x-cache"
+	cacheTierHeader    = "x-cache-tier"
+	cacheHitsHeader    = "x-cache-hits"
 )
 
+// setCacheStatus 設定單張請求的快取 trailer；tier 為空字串代表未命中
+func setCacheStatus(ctx context.Context, tier string) {
+	md := metadata.Pairs(cacheStatusHeader, "miss")
+	if tier != "" {
+		md = metadata.Pairs(cacheStatusHeader, "hit", cacheTierHeader, tier)
+	}
+	if err := grpc.SetTrailer(ctx, md); err != nil {
+		log.Printf("⚠️ 無法設定快取 trailer：%v", err)
+	}
+}
+
+// setCacheHits 設定 batch 請求中命中快取的張數
+func setCacheHits(ctx context.Context, hits int) {
+	if err := grpc.SetTrailer(ctx, metadata.Pairs(cacheHitsHeader, strconv.Itoa(hits))); err != nil {
+		log.Printf("⚠️ 無法設定快取 trailer：%v", err)
+	}
+}
+
 // CacheManager defines the interface for cache management
 type CacheManager interface {
-	Get(key string) (interface{}, bool)
-	Set(key string, value interface{})
+	Get(key string) ([]byte, bool)
+	Set(key string, value []byte)
 	Delete(key string)
 	Clear()
 }
 
-// InMemoryCache implements an in-memory cache
-type InMemoryCache struct {
-	items      map[string]*cacheItem
-	mu         sync.RWMutex
-	ttl        time.Duration
-	cleanupInterval time.Duration
-	quit       chan struct{}
+// lruEntry 為 LRU list 中的一個項目
+type lruEntry struct {
+	key        string
+	value      []byte
+	expiration time.Time
 }
 
-// cacheItem represents an item in the cache
-type cacheItem struct {
-	value      interface{}
-	expiration time.Time
+// lruShard 是一個獨立上鎖的 LRU；list 前端為最近使用
+type lruShard struct {
+	mu     sync.Mutex
+	items  map[string]*list.Element
+	order  *list.List
+	bytes  int64
+	budget int64
+}
+
+// LRUCache 為分片、以 byte 計算容量的 LRU 快取
+type LRUCache struct {
+	shards []*lruShard
+	ttl    time.Duration
 }
 
-// NewInMemoryCache creates a new in-memory cache
-func NewInMemoryCache(ttlMinutes int) *InMemoryCache {
-	ttl := time.Duration(ttlMinutes) * time.Minute
-	cache := &InMemoryCache{
-		items:      make(map[string]*cacheItem),
-		ttl:        ttl,
-		cleanupInterval: ttl / 2,
-		quit:       make(chan struct{}),
+// NewLRUCache 建立總預算 maxBytes、分成 shards 個分片的 LRU；ttl <= 0 代表不過期
+func NewLRUCache(maxBytes int64, shards int, ttl time.Duration) *LRUCache {
+	if shards < 1 {
+		shards = 1
 	}
-	
-	// Start the cleanup goroutine
-	go cache.cleanup()
-	
-	return cache
+	c := &LRUCache{shards: make([]*lruShard, shards), ttl: ttl}
+	for i := range c.shards {
+		c.shards[i] = &lruShard{
+			items:  make(map[string]*list.Element),
+			order:  list.New(),
+			budget: maxBytes / int64(shards),
+		}
+	}
+	return c
 }
 
-// Get retrieves a value from the cache
-func (c *InMemoryCache) Get(key string) (interface{}, bool) {
-	c.mu.RLock()
-	defer c.mu.RUnlock()
-	
-	item, found := c.items[key]
+func (c *LRUCache) shard(key string) *lruShard {
+	h := fnv.New32a()
+	h.Write([]byte(key))
+	return c.shards[h.Sum32()%uint32(len(c.shards))]
+}
+
+// Get 取得圖片並移到最近使用；過期的項目在此時移除
+func (c *LRUCache) Get(key string) ([]byte, bool) {
+	s := c.shard(key)
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	el, found := s.items[key]
 	if !found {
 		return nil, false
 	}
-	
-	// Check if the item has expired
-	if time.Now().After(item.expiration) {
+	entry := el.Value.(*lruEntry)
+	if !entry.expiration.IsZero() && time.Now().After(entry.expiration) {
+		s.remove(el)
 		return nil, false
 	}
-	
-	return item.value, true
+	s.order.MoveToFront(el)
+	return entry.value, true
 }
 
-// Set adds a value to the cache
-func (c *InMemoryCache) Set(key string, value interface{}) {
-	c.mu.Lock()
-	defer c.mu.Unlock()
-	
-	c.items[key] = &cacheItem{
-		value:      value,
-		expiration: time.Now().Add(c.ttl),
+// Set 寫入圖片，超過分片預算時淘汰最久未使用的項目；單張超過分片預算的圖片不快取
+func (c *LRUCache) Set(key string, value []byte) {
+	s := c.shard(key)
+	size := int64(len(value))
+	if size > s.budget {
+		return
+	}
+	var expiration time.Time
+	if c.ttl > 0 {
+		expiration = time.Now().Add(c.ttl)
+	}
+
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	if el, found := s.items[key]; found {
+		s.remove(el)
+	}
+	s.items[key] = s.order.PushFront(&lruEntry{key: key, value: value, expiration: expiration})
+	s.bytes += size
+	for s.bytes > s.budget {
+		s.remove(s.order.Back())
 	}
 }
 
 // Delete removes a value from the cache
-func (c *InMemoryCache) Delete(key string) {
-	c.mu.Lock()
-	defer c.mu.Unlock()
-	
-	delete(c.items, key)
+func (c *LRUCache) Delete(key string) {
+	s := c.shard(key)
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	if el, found := s.items[key]; found {
+		s.remove(el)
+	}
 }
 
 // Clear removes all values from the cache
-func (c *InMemoryCache) Clear() {
-	c.mu.Lock()
-	defer c.mu.Unlock()
-	
-	c.items = make(map[string]*cacheItem)
-}
-
-// cleanup periodically removes expired items from the cache
-func (c *InMemoryCache) cleanup() {
-	ticker := time.NewTicker(c.cleanupInterval)
-	defer ticker.Stop()
-	
-	for {
-		select {
-		case <-ticker.C:
-			c.removeExpired()
-		case <-c.quit:
-			return
-		}
+func (c *LRUCache) Clear() {
+	for _, s := range c.shards {
+		s.mu.Lock()
+		s.items = make(map[string]*list.Element)
+		s.order.Init()
+		s.bytes = 0
+		s.mu.Unlock()
 	}
 }
 
-// removeExpired removes expired items from the cache
-func (c *InMemoryCache) removeExpired() {
+// Bytes 回傳目前快取的總 byte 數
+func (c *LRUCache) Bytes() int64 {
+	var total int64
+	for _, s := range c.shards {
+		s.mu.Lock()
+		total += s.bytes
+		s.mu.Unlock()
+	}
+	return total
+}
+
+// remove 移除項目；呼叫端必須持有 mu
+func (s *lruShard) remove(el *list.Element) {
+	entry := s.order.Remove(el).(*lruEntry)
+	delete(s.items, entry.key)
+	s.bytes -= int64(len(entry.value))
+}
+
+// DiskCache 將圖片存成檔案，以 prompt hash 為檔名；讀取時更新 mtime，淘汰時刪除 mtime 最舊的檔案
+type DiskCache struct {
+	dir    string
+	budget int64 // <= 0 代表不限制
+	bytes  atomic.Int64
+	mu     sync.Mutex // 淘汰時持有，避免同時掃描目錄
+}
+
+// NewDiskCache 建立磁碟快取並計算既有檔案的總大小
+func NewDiskCache(dir string, maxBytes int64) (*DiskCache, error) {
+	if err := os.MkdirAll(dir, 0o755); err != nil {
+		return nil, err
+	}
+	c := &DiskCache{dir: dir, budget: maxBytes}
+	var total int64
+	for _, f := range c.files() {
+		total += f.size
+	}
+	c.bytes.Store(total)
+	return c, nil
+}
+
+func (c *DiskCache) path(key string) string {
+	prefix := key
+	if len(prefix) > 2 {
+		prefix = prefix[:2]
+	}
+	return filepath.Join(c.dir, prefix, key+".img")
+}
+
+// Get 讀取圖片並更新 mtime（作為 LRU 順序）
+func (c *DiskCache) Get(key string) ([]byte, bool) {
+	path := c.path(key)
+	data, err := os.ReadFile(path)
+	if err != nil {
+		return nil, false
+	}
 	now := time.Now()
-	
+	os.Chtimes(path, now, now)
+	return data, true
+}
+
+// Set 先寫暫存檔再 rename，server 當機時不會留下寫到一半的圖片
+func (c *DiskCache) Set(key string, value []byte) {
+	path := c.path(key)
+	if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+		log.Printf("⚠️ 磁碟快取寫入失敗：%v", err)
+		return
+	}
+	var previous int64
+	if info, err := os.Stat(path); err == nil {
+		previous = info.Size()
+	}
+	tmp, err := os.CreateTemp(filepath.Dir(path), key+".*.tmp")
+	if err != nil {
+		log.Printf("⚠️ 磁碟快取寫入失敗：%v", err)
+		return
+	}
+	_, err = tmp.Write(value)
+	if closeErr := tmp.Close(); err == nil {
+		err = closeErr
+	}
+	if err == nil {
+		err = os.Rename(tmp.Name(), path)
+	}
+	if err != nil {
+		os.Remove(tmp.Name())
+		log.Printf("⚠️ 磁碟快取寫入失敗：%v", err)
+		return
+	}
+	if c.bytes.Add(int64(len(value))-previous) > c.budget && c.budget > 0 {
+		c.evict()
+	}
+}
+
+// Delete removes a value from the cache
+func (c *DiskCache) Delete(key string) {
+	path := c.path(key)
+	if info, err := os.Stat(path); err == nil && os.Remove(path) == nil {
+		c.bytes.Add(-info.Size())
+	}
+}
+
+// Clear removes all values from the cache
+func (c *DiskCache) Clear() {
+	for _, f := range c.files() {
+		os.Remove(f.path)
+	}
+	c.bytes.Store(0)
+}
+
+type diskFile struct {
+	path    string
+	size    int64
+	modTime time.Time
+}
+
+func (c *DiskCache) files() []diskFile {
+	var files []diskFile
+	filepath.WalkDir(c.dir, func(path string, d os.DirEntry, err error) error {
+		if err != nil || d.IsDir() || !strings.HasSuffix(path, ".img") {
+			return nil
+		}
+		if info, err := d.Info(); err == nil {
+			files = append(files, diskFile{path: path, size: info.Size(), modTime: info.ModTime()})
+		}
+		return nil
+	})
+	return files
+}
+
+// evict 刪除最久未讀取的檔案，直到低於預算的 90%（避免每次寫入都掃描目錄）
+func (c *DiskCache) evict() {
 	c.mu.Lock()
 	defer c.mu.Unlock()
-	
-	for key, item := range c.items {
-		if now.After(item.expiration) {
-			delete(c.items, key)
+
+	files := c.files()
+	sort.Slice(files, func(i, j int) bool { return files[i].modTime.Before(files[j].modTime) })
+	var total int64
+	for _, f := range files {
+		total += f.size
+	}
+	target := c.budget * 9 / 10
+	removed := 0
+	for _, f := range files {
+		if total <= target {
+			break
+		}
+		if os.Remove(f.path) == nil {
+			total -= f.size
+			removed++
 		}
 	}
+	c.bytes.Store(total)
+	log.Printf("🧹 磁碟快取超過預算，已刪除 %d 個檔案（剩餘 %d MB）", removed, total>>20)
 }
 
-// Stop stops the cleanup goroutine
-func (c *InMemoryCache) Stop() {
-	close(c.quit)
+// TieredCache 先查記憶體再查磁碟，磁碟命中時放回記憶體
+type TieredCache struct {
+	memory *LRUCache
+	disk   *DiskCache // nil 代表只使用記憶體
+}
+
+// NewTieredCacheFromEnv 依環境變數建立快取；IMAGE_CACHE_ENABLED=false 時回傳 nil
+//
+//	IMAGE_CACHE_MAX_MB       記憶體預算（預設 256）
+//	IMAGE_CACHE_TTL_MINUTES  記憶體 TTL（預設 60，0 代表不過期）
+//	IMAGE_CACHE_DIR          磁碟快取目錄（預設 cache，設為空字串停用）
+//	IMAGE_CACHE_DISK_MAX_MB  磁碟預算（預設 2048）
+func NewTieredCacheFromEnv() *TieredCache {
+	if v := os.Getenv("IMAGE_CACHE_ENABLED"); v != "" {
+		if enabled, err := strconv.ParseBool(v); err == nil && !enabled {
+			log.Println("🗃️ 圖片快取已停用")
+			return nil
+		}
+	}
+	envInt := func(key string, fallback int) int {
+		if v, err := strconv.Atoi(os.Getenv(key)); err == nil && v >= 0 {
+			return v
+		}
+		return fallback
+	}
+	maxMB := envInt("IMAGE_CACHE_MAX_MB", 256)
+	ttl := time.Duration(envInt("IMAGE_CACHE_TTL_MINUTES", 60)) * time.Minute
+	c := &TieredCache{memory: NewLRUCache(int64(maxMB)<<20, 16, ttl)}
+
+	dir, ok := os.LookupEnv("IMAGE_CACHE_DIR")
+	if !ok {
+		dir = "cache"
+	}
+	if dir != "" {
+		diskMB := envInt("IMAGE_CACHE_DISK_MAX_MB", 2048)
+		disk, err := NewDiskCache(dir, int64(diskMB)<<20)
+		if err != nil {
+			log.Printf("⚠️ 無法建立磁碟快取 %s，只使用記憶體：%v", dir, err)
+		} else {
+			c.disk = disk
+			log.Printf("🗃️ 圖片快取：記憶體 %d MB（TTL %s），磁碟 %s %d MB（已有 %d MB）",
+				maxMB, ttl, dir, diskMB, disk.bytes.Load()>>20)
+			return c
+		}
+	}
+	log.Printf("🗃️ 圖片快取：記憶體 %d MB（TTL %s）", maxMB, ttl)
+	return c
+}
+
+// Lookup 回傳圖片與命中的層級（memory / disk）
+func (c *TieredCache) Lookup(key string) ([]byte, string, bool) {
+	if data, ok := c.memory.Get(key); ok {
+		return data, "memory", true
+	}
+	if c.disk != nil {
+		if data, ok := c.disk.Get(key); ok {
+			c.memory.Set(key, data)
+			return data, "disk", true
+		}
+	}
+	return nil, "", false
+}
+
+// Get retrieves a value from the cache
+func (c *TieredCache) Get(key string) ([]byte, bool) {
+	data, _, ok := c.Lookup(key)
+	return data, ok
+}
+
+// Set 同時寫入記憶體與磁碟
+func (c *TieredCache) Set(key string, value []byte) {
+	c.memory.Set(key, value)
+	if c.disk != nil {
+		c.disk.Set(key, value)
+	}
+}
+
+// Delete removes a value from the cache
+func (c *TieredCache) Delete(key string) {
+	c.memory.Delete(key)
+	if c.disk != nil {
+		c.disk.Delete(key)
+	}
+}
+
+// Clear removes all values from the cache
+func (c *TieredCache) Clear() {
+	c.memory.Clear()
+	if c.disk != nil {
+		c.disk.Clear()
+	}
 }
 
 // NoOpCache implements a no-op cache that doesn't actually cache anything
@@ -132,12 +426,12 @@ func NewNoOpCache() *NoOpCache {
 }
 
 // Get always returns not found
-func (c *NoOpCache) Get(key string) (interface{}, bool) {
+func (c *NoOpCache) Get(key string) ([]byte, bool) {
 	return nil, false
 }
 
 // Set does nothing
-func (c *NoOpCache) Set(key string, value interface{}) {}
+func (c *NoOpCache) Set(key string, value []byte) {}
 
 // Delete does nothing
 func (c *NoOpCache) Delete(key string) {}
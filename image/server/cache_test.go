@@ -0,0 +1,114 @@
+package main
+
+import (
+	"fmt"
+	"os"
+	"testing"
+	"time"
+)
+
+func TestLRUEvictsLeastRecentlyUsedWithinBudget(t *testing.T) {
+	c := NewLRUCache(300, 1, 0)
+	c.Set("a", make([]byte, 100))
+	c.Set("b", make([]byte, 100))
+	c.Set("c", make([]byte, 100))
+	c.Get("a")                    // a 變成最近使用
+	c.Set("d", make([]byte, 100)) // 淘汰 b
+	if _, ok := c.Get("b"); ok {
+		t.Fatal("b should have been evicted")
+	}
+	for _, key := range []string{"a", "c", "d"} {
+		if _, ok := c.Get(key); !ok {
+			t.Fatalf("%s should still be cached", key)
+		}
+	}
+	if got := c.Bytes(); got != 300 {
+		t.Fatalf("Bytes() = %d, want 300", got)
+	}
+}
+
+func TestLRUEvictsSeveralEntriesForOneLargeValue(t *testing.T) {
+	c := NewLRUCache(300, 1, 0)
+	for _, key := range []string{"a", "b", "c"} {
+		c.Set(key, make([]byte, 100))
+	}
+	c.Set("big", make([]byte, 250))
+	if got := c.Bytes(); got != 250 {
+		t.Fatalf("Bytes() = %d, want 250", got)
+	}
+	for _, key := range []string{"a", "b", "c"} {
+		if _, ok := c.Get(key); ok {
+			t.Fatalf("%s should have been evicted", key)
+		}
+	}
+}
+
+func TestLRUSkipsValuesLargerThanShardBudget(t *testing.T) {
+	c := NewLRUCache(300, 1, 0)
+	c.Set("a", make([]byte, 100))
+	c.Set("huge", make([]byte, 400))
+	if _, ok := c.Get("huge"); ok {
+		t.Fatal("value larger than the budget should not be cached")
+	}
+	if _, ok := c.Get("a"); !ok || c.Bytes() != 100 {
+		t.Fatal("oversized value should not evict existing entries")
+	}
+}
+
+func TestLRUReplaceUpdatesByteCount(t *testing.T) {
+	c := NewLRUCache(300, 1, 0)
+	c.Set("a", make([]byte, 200))
+	c.Set("a", make([]byte, 50))
+	if got := c.Bytes(); got != 50 {
+		t.Fatalf("Bytes() = %d, want 50", got)
+	}
+	c.Delete("a")
+	if got := c.Bytes(); got != 0 {
+		t.Fatalf("Bytes() = %d after Delete, want 0", got)
+	}
+}
+
+func TestLRUShardedTotalStaysWithinBudget(t *testing.T) {
+	c := NewLRUCache(4000, 4, 0)
+	for i := 0; i < 200; i++ {
+		c.Set(fmt.Sprintf("key-%d", i), make([]byte, 100))
+	}
+	if got := c.Bytes(); got > 4000 {
+		t.Fatalf("Bytes() = %d, want <= 4000", got)
+	}
+}
+
+func TestLRUExpiredEntryIsDroppedOnRead(t *testing.T) {
+	c := NewLRUCache(1000, 1, 20*time.Millisecond)
+	c.Set("x", []byte("1"))
+	time.Sleep(30 * time.Millisecond)
+	if _, ok := c.Get("x"); ok || c.Bytes() != 0 {
+		t.Fatal("expired entry should be removed on read")
+	}
+}
+
+func TestDiskCacheEvictsOldestFilesOverBudget(t *testing.T) {
+	c, err := NewDiskCache(t.TempDir(), 1000)
+	if err != nil {
+		t.Fatal(err)
+	}
+	base := time.Now().Add(-time.Hour)
+	for i, key := range []string{"aa1", "bb2", "cc3", "dd4"} {
+		c.Set(key, make([]byte, 240))
+		stamp := base.Add(time.Duration(i) * time.Minute)
+		os.Chtimes(c.path(key), stamp, stamp)
+	}
+	c.Get("aa1")                    // 讀取後 mtime 更新，變成最新
+	c.Set("ee5", make([]byte, 240)) // 超過 1000，刪到 900 以下
+	if _, ok := c.Get("bb2"); ok {
+		t.Fatal("bb2 was the least recently read and should have been evicted")
+	}
+	for _, key := range []string{"aa1", "ee5"} {
+		if _, ok := c.Get(key); !ok {
+			t.Fatalf("%s should still be on disk", key)
+		}
+	}
+	if got := c.bytes.Load(); got > 900 {
+		t.Fatalf("bytes = %d, want <= 900", got)
+	}
+}
@@ -7,78 +7,210 @@ import (
 	"image_server/pb"
 	"log"
 	"sync"
+	"time"
+
+	"google.golang.org/grpc/status"
 )
 
 type ImageHandler struct {
 	pb.UnimplementedImageServiceServer
+	quota *Quota             // nil 代表不限流
+	sched *PriorityScheduler // nil 代表不排隊，直接呼叫 OpenAI
+	cache *TieredCache       // nil 代表不快取
+}
+
+// admit 檢查額度；背景請求在前景流量高時會被拒絕
+func (h *ImageHandler) admit(ctx context.Context, n int) error {
+	if h.quota == nil {
+		return nil
+	}
+	return h.quota.Admit(ctx, n)
+}
+
+// lookup 查快取，回傳命中的層級（memory / disk）；未啟用快取或 client 要求 refresh 時視為未命中
+func (h *ImageHandler) lookup(ctx context.Context, hash string, timing *serverTiming) ([]byte, string, bool) {
+	if h.cache == nil || hasMetadata(ctx, cacheControlHeader, cacheRefresh) {
+		return nil, "", false
+	}
+	stage := time.Now()
+	data, tier, ok := h.cache.Lookup(hash)
+	if ok {
+		timing.add("cache", time.Since(stage))
+	}
+	return data, tier, ok
+}
+
+// generate 依 priority 排隊後呼叫 OpenAI 並寫入快取，記錄 queue / openai 耗時
+//
+// 只有快取未命中的 prompt 會走到這裡，額度（admit）也只為這些 prompt 扣除
+func (h *ImageHandler) generate(ctx context.Context, priority int32, prompt, hash string, enqueued time.Time, timing *serverTiming) ([]byte, error) {
+	var imgData []byte
+	var genErr error
+	run := func() {
+		timing.add("queue", time.Since(enqueued))
+		stage := time.Now()
+		imgData, genErr = GetImageFromOpenAI(ctx, prompt)
+		timing.add("openai", time.Since(stage))
+	}
+	if h.sched == nil {
+		run()
+	} else if err := h.sched.Do(ctx, priority, run); err != nil {
+		// 排隊中 ctx 結束：轉成 DEADLINE_EXCEEDED / CANCELED，client 才能正確 failover
+		return nil, status.FromContextError(err).Err()
+	}
+	if genErr == nil && h.cache != nil {
+		h.cache.Set(hash, imgData)
+	}
+	return imgData, genErr
 }
 
 func (h *ImageHandler) GenerateImage(ctx context.Context, req *pb.ImageRequest) (*pb.ImageResponse, error) {
+	start := time.Now()
+	traceID := traceIDAt(traceIDs(ctx), 0)
+	timing := &serverTiming{}
 	prompt := req.GetPrompt()
 	hash := fmt.Sprintf("%x", sha1.Sum([]byte(prompt)))
 
-	imgData, err := GetImageFromOpenAI(prompt)
+	// 快取命中不呼叫 OpenAI，不扣額度
+	imgData, tier, hit := h.lookup(ctx, hash, timing)
+	if !hit {
+		if err := h.admit(ctx, 1); err != nil {
+			return nil, err
+		}
+		var err error
+		imgData, err = h.generate(ctx, req.GetPriority(), prompt, hash, time.Now(), timing)
+		if err != nil {
+			log.Printf("❌ [trace %s] 單圖產圖失敗：%v", traceID, err)
+			return nil, err
+		}
+	}
+	setCacheStatus(ctx, tier)
+
+	stage := time.Now()
+	encoded, fileType, err := EncodeImage(imgData, req.GetAcceptFormats(), req.GetQuality())
 	if err != nil {
-		log.Printf("❌ 單圖產圖失敗：%v", err)
-		return nil, err
+		log.Printf("⚠️ [trace %s] 轉檔失敗，改回傳 png：%v", traceID, err)
+		encoded, fileType = imgData, "png"
 	}
+	timing.add("encode", time.Since(stage))
+	timing.add("total", time.Since(start))
+	setServerTiming(ctx, timing)
 
 	return &pb.ImageResponse{
-		ImageData:  imgData,
+		ImageData:  encoded,
 		PromptHash: hash,
-		FileType:   "png",
+		FileType:   fileType,
 	}, nil
 }
 
 func (h *ImageHandler) GenerateBatch(ctx context.Context, req *pb.BatchRequest) (*pb.BatchResponse, error) {
+	start := time.Now()
+	ids := traceIDs(ctx)
 	prompts := req.GetPrompts()
-	var wg sync.WaitGroup
-
-	numWorker := 3
+	accept := req.GetAcceptFormats()
+	quality := req.GetQuality()
+	priority := req.GetPriority()
 	type result struct {
-		item *pb.BatchItem
-		err  error
+		item   *pb.BatchItem
+		timing *serverTiming
+		err    error
+	}
+	type entry struct {
+		hash   string
+		data   []byte
+		hit    bool
+		timing *serverTiming
+	}
+
+	// 先查快取，只為未命中的 prompt 扣額度；背景請求全部命中時不會因額度不足被拒絕
+	entries := make([]entry, len(prompts))
+	var lookups sync.WaitGroup
+	for i, prompt := range prompts {
+		lookups.Add(1)
+		go func(index int, prompt string) {
+			defer lookups.Done()
+			hash := fmt.Sprintf("%x", sha1.Sum([]byte(prompt)))
+			timing := &serverTiming{desc: hash}
+			data, _, hit := h.lookup(ctx, hash, timing)
+			entries[index] = entry{hash: hash, data: data, hit: hit, timing: timing}
+		}(i, prompt)
 	}
+	lookups.Wait()
 
-	jobs := make(chan string, len(prompts))
+	hits := 0
+	for _, e := range entries {
+		if e.hit {
+			hits++
+		}
+	}
+	generateMisses := true
+	if misses := len(prompts) - hits; misses > 0 {
+		if err := h.admit(ctx, misses); err != nil {
+			if hits == 0 {
+				return nil, err
+			}
+			// 背景請求額度不足：仍回傳快取命中的圖片，未命中的略過（client 視同產圖失敗，稍後再試）
+			generateMisses = false
+		}
+	}
+	setCacheHits(ctx, hits)
+
+	// 未命中的 prompt 各自進入共用的 priority queue，同時進行的 OpenAI 呼叫數由 scheduler 的 worker 數決定
+	var wg sync.WaitGroup
 	resultChan := make(chan result, len(prompts))
 
-	for i := 0; i < numWorker; i++ {
+	for i, prompt := range prompts {
+		if !entries[i].hit && !generateMisses {
+			continue
+		}
 		wg.Add(1)
-		go func(workerID int) {
+		go func(index int, prompt string) {
 			defer wg.Done()
-			for prompt := range jobs {
-				hash := fmt.Sprintf("%x", sha1.Sum([]byte(prompt)))
-				imgData, err := GetImageFromOpenAI(prompt)
+			e := entries[index]
+			hash, timing, imgData := e.hash, e.timing, e.data
+			traceID := traceIDAt(ids, index)
+
+			if !e.hit {
+				var err error
+				imgData, err = h.generate(ctx, priority, prompt, hash, start, timing)
 				if err != nil {
-					log.Printf("❌ Worker %d 處理失敗：%v", workerID, err)
-					continue
+					log.Printf("❌ [trace %s] 第 %d 張處理失敗：%v", traceID, index, err)
+					return
 				}
+			}
 
-				resultChan <- result{item: &pb.BatchItem{
-					Prompt:     prompt,
-					PromptHash: hash,
-					ImageData:  imgData,
-					FileType:   "png",
-				}, err: nil}
+			stage := time.Now()
+			encoded, fileType, err := EncodeImage(imgData, accept, quality)
+			if err != nil {
+				log.Printf("⚠️ [trace %s] 第 %d 張轉檔失敗，改回傳 png：%v", traceID, index, err)
+				encoded, fileType = imgData, "png"
 			}
-		}(i)
-	}
+			timing.add("encode", time.Since(stage))
 
-	for _, prompt := range prompts {
-		jobs <- prompt
+			resultChan <- result{item: &pb.BatchItem{
+				Prompt:     prompt,
+				PromptHash: hash,
+				ImageData:  encoded,
+				FileType:   fileType,
+			}, timing: timing, err: nil}
+		}(i, prompt)
 	}
-	close(jobs)
 
 	wg.Wait()
 	close(resultChan)
 
 	var items []*pb.BatchItem
+	var timings []*serverTiming
 	for r := range resultChan {
 		if r.item != nil {
 			items = append(items, r.item)
+			timings = append(timings, r.timing)
 		}
 	}
 
+	total := &serverTiming{}
+	total.add("total", time.Since(start))
+	setServerTiming(ctx, append(timings, total)...)
+
 	return &pb.BatchResponse{Items: items}, nil
 }
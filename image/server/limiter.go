@@ -55,6 +55,40 @@ func (l *TokenBucketLimiter) Allow() bool {
 	return true
 }
 
+// refill adds tokens for the time elapsed since the last refill; callers must hold mu
+func (l *TokenBucketLimiter) refill() {
+	now := time.Now()
+	l.tokens = min(l.capacity, l.tokens+now.Sub(l.lastRefill).Seconds()*l.rate)
+	l.lastRefill = now
+}
+
+// Take consumes n tokens unconditionally, going into debt down to -capacity.
+// Used for foreground requests that must not be rejected but should still use up the budget.
+func (l *TokenBucketLimiter) Take(n float64) {
+	l.mu.Lock()
+	defer l.mu.Unlock()
+
+	l.refill()
+	l.tokens -= n
+	if l.tokens < -l.capacity {
+		l.tokens = -l.capacity
+	}
+}
+
+// TakeIfAbove consumes n tokens only if at least reserve tokens remain afterwards,
+// so background work only uses budget that foreground requests are leaving idle.
+func (l *TokenBucketLimiter) TakeIfAbove(n, reserve float64) bool {
+	l.mu.Lock()
+	defer l.mu.Unlock()
+
+	l.refill()
+	if l.tokens-n < reserve {
+		return false
+	}
+	l.tokens -= n
+	return true
+}
+
 // min returns the minimum of two float64 values
 func min(a, b float64) float64 {
 	if a < b {
@@ -5,20 +5,31 @@ import (
 	"image_server/pb"
 	"log"
 	"net"
+	"os"
 )
 
 func main() {
 	LoadEnv()
 
-	lis, err := net.Listen("tcp", ":50051")
+	// 以 IMAGE_SERVER_ADDR 指定監聽位址，方便同機啟動多個 replica
+	addr := os.Getenv("IMAGE_SERVER_ADDR")
+	if addr == "" {
+		addr = ":50051"
+	}
+
+	lis, err := net.Listen("tcp", addr)
 	if err != nil {
 		log.Fatalf("❌ 無法監聽: %v", err)
 	}
 
 	grpcServer := grpc.NewServer()
-	pb.RegisterImageServiceServer(grpcServer, &ImageHandler{})
+	pb.RegisterImageServiceServer(grpcServer, &ImageHandler{
+		quota: NewQuotaFromEnv(),
+		sched: NewPrioritySchedulerFromEnv(),
+		cache: NewTieredCacheFromEnv(),
+	})
 
-	log.Println("🚀 gRPC server is running on :50051")
+	log.Printf("🚀 gRPC server is running on %s", addr)
 	if err := grpcServer.Serve(lis); err != nil {
 		log.Fatalf("❌ gRPC 錯誤: %v", err)
 	}
@@ -2,6 +2,7 @@ package main
 
 import (
 	"bytes"
+	"context"
 	"encoding/base64"
 	"encoding/json"
 	"errors"
@@ -9,9 +10,13 @@ import (
 	"io"
 	"net/http"
 	"os"
+	"strings"
 	"time"
 )
 
+// defaultOpenAIBaseURL 可用 OPENAI_BASE_URL 覆寫（例如指向 bench/fake_openai.py）
+const defaultOpenAIBaseURL = "https://api.openai.com/v1"
+
 type openAIImageRequest struct {
 	Prompt         string `json:"prompt"`
 	N              int    `json:"n"`
@@ -26,7 +31,8 @@ type openAIImageResponse struct {
 	} `json:"data"`
 }
 
-func GetImageFromOpenAI(prompt string) ([]byte, error) {
+// GetImageFromOpenAI 產生圖片；ctx 被取消（例如 client 端 hedge 落敗）時會中止上游請求
+func GetImageFromOpenAI(ctx context.Context, prompt string) ([]byte, error) {
 	apiKey := os.Getenv("OPENAI_API_KEY")
 	if apiKey == "" {
 		return nil, errors.New("OPENAI_API_KEY 未設定")
@@ -39,8 +45,13 @@ func GetImageFromOpenAI(prompt string) ([]byte, error) {
 		ResponseFormat: "b64_json",
 	}
 
+	baseURL := os.Getenv("OPENAI_BASE_URL")
+	if baseURL == "" {
+		baseURL = defaultOpenAIBaseURL
+	}
+
 	body, _ := json.Marshal(payload)
-	req, _ := http.NewRequest("POST", "https://api.openai.com/v1/images/generations", bytes.NewReader(body))
+	req, _ := http.NewRequestWithContext(ctx, "POST", strings.TrimRight(baseURL, "/")+"/images/generations", bytes.NewReader(body))
 	req.Header.Set("Authorization", "Bearer "+apiKey)
 	req.Header.Set("Content-Type", "application/json")
 
@@ -0,0 +1,182 @@
+package main
+
+import (
+	"container/heap"
+	"context"
+	"log"
+	"os"
+	"strconv"
+	"sync"
+	"time"
+)
+
+// 所有 OpenAI 呼叫（GenerateImage 與 GenerateBatch 的每個 prompt）都先進入同一個 priority queue，
+// 由固定數量的 worker 依優先序取出執行：審核時的重產（priority > 0）會排在批次與背景預先產圖前面。
+//
+// 老化：每等待 agingStep 視同優先序 +1，背景工作不會被持續湧入的前景請求餓死。
+// 兩個任務比較時「現在時間」會互相抵銷，因此只要依 enqueued - priority*agingStep
+// （虛擬截止時間）排序即可，排入後不必重新 heapify。
+
+// scheduledTask 為 queue 中的一個任務
+type scheduledTask struct {
+	run      func()
+	priority int32
+	deadline int64  // 虛擬截止時間（UnixNano），越早越先執行
+	seq      uint64 // 截止時間相同時維持 FIFO
+	index    int    // heap 中的位置，-1 代表已取出
+	done     chan struct{}
+}
+
+// taskHeap 實作 container/heap.Interface
+type taskHeap []*scheduledTask
+
+func (h taskHeap) Len() int { return len(h) }
+
+func (h taskHeap) Less(i, j int) bool {
+	if h[i].deadline != h[j].deadline {
+		return h[i].deadline < h[j].deadline
+	}
+	return h[i].seq < h[j].seq
+}
+
+func (h taskHeap) Swap(i, j int) {
+	h[i], h[j] = h[j], h[i]
+	h[i].index = i
+	h[j].index = j
+}
+
+func (h *taskHeap) Push(x interface{}) {
+	t := x.(*scheduledTask)
+	t.index = len(*h)
+	*h = append(*h, t)
+}
+
+func (h *taskHeap) Pop() interface{} {
+	old := *h
+	n := len(old)
+	t := old[n-1]
+	old[n-1] = nil
+	t.index = -1
+	*h = old[:n-1]
+	return t
+}
+
+// PriorityScheduler 以固定數量的 worker 依優先序（含老化）執行任務
+type PriorityScheduler struct {
+	mu        sync.Mutex
+	cond      *sync.Cond
+	queue     taskHeap
+	agingStep time.Duration
+	seq       uint64
+	closed    bool
+	wg        sync.WaitGroup
+}
+
+// NewPriorityScheduler 建立並啟動 workers 個 worker；agingStep 為優先序 +1 所需的等待時間
+func NewPriorityScheduler(workers int, agingStep time.Duration) *PriorityScheduler {
+	if workers < 1 {
+		workers = 1
+	}
+	if agingStep <= 0 {
+		agingStep = time.Second
+	}
+	s := &PriorityScheduler{agingStep: agingStep}
+	s.cond = sync.NewCond(&s.mu)
+	for i := 0; i < workers; i++ {
+		s.wg.Add(1)
+		go s.worker()
+	}
+	return s
+}
+
+// NewPrioritySchedulerFromEnv 依 IMAGE_WORKER_COUNT（同時進行的 OpenAI 呼叫數，預設 5）與
+// IMAGE_PRIORITY_AGING_MS（優先序 +1 所需的等待毫秒數，預設 1000）建立 scheduler
+func NewPrioritySchedulerFromEnv() *PriorityScheduler {
+	workers := 5
+	if v, err := strconv.Atoi(os.Getenv("IMAGE_WORKER_COUNT")); err == nil && v > 0 {
+		workers = v
+	}
+	aging := time.Second
+	if v, err := strconv.Atoi(os.Getenv("IMAGE_PRIORITY_AGING_MS")); err == nil && v > 0 {
+		aging = time.Duration(v) * time.Millisecond
+	}
+	log.Printf("🧮 priority scheduler：%d 個 worker，每等待 %s 優先序 +1", workers, aging)
+	return NewPriorityScheduler(workers, aging)
+}
+
+// Do 排入 fn 並等待執行完成；ctx 在開始執行前結束時會移出 queue 並回傳 ctx.Err()
+func (s *PriorityScheduler) Do(ctx context.Context, priority int32, fn func()) error {
+	t := &scheduledTask{run: fn, priority: priority, done: make(chan struct{})}
+
+	s.mu.Lock()
+	if s.closed {
+		s.mu.Unlock()
+		return context.Canceled
+	}
+	s.seq++
+	t.seq = s.seq
+	t.deadline = time.Now().UnixNano() - int64(priority)*int64(s.agingStep)
+	heap.Push(&s.queue, t)
+	s.mu.Unlock()
+	s.cond.Signal()
+
+	select {
+	case <-t.done:
+		return nil
+	case <-ctx.Done():
+		s.mu.Lock()
+		queued := t.index >= 0
+		if queued {
+			heap.Remove(&s.queue, t.index)
+		}
+		s.mu.Unlock()
+		if queued {
+			return ctx.Err()
+		}
+		// 已開始執行，等待完成（fn 本身應使用同一個 ctx）
+		<-t.done
+		return nil
+	}
+}
+
+// QueueSize 回傳等待中的任務數
+func (s *PriorityScheduler) QueueSize() int {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return len(s.queue)
+}
+
+// Close 停止接受新任務，等待 queue 中的任務執行完畢後結束 worker
+func (s *PriorityScheduler) Close() {
+	s.mu.Lock()
+	s.closed = true
+	s.mu.Unlock()
+	s.cond.Broadcast()
+	s.wg.Wait()
+}
+
+func (s *PriorityScheduler) worker() {
+	defer s.wg.Done()
+	for {
+		s.mu.Lock()
+		for len(s.queue) == 0 && !s.closed {
+			s.cond.Wait()
+		}
+		if len(s.queue) == 0 {
+			s.mu.Unlock()
+			return
+		}
+		t := heap.Pop(&s.queue).(*scheduledTask)
+		s.mu.Unlock()
+
+		func() {
+			defer close(t.done)
+			defer func() {
+				if r := recover(); r != nil {
+					log.Printf("❌ scheduler 任務 panic（priority %d）：%v", t.priority, r)
+				}
+			}()
+			t.run()
+		}()
+	}
+}
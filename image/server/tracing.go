@@ -0,0 +1,65 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"log"
+	"strings"
+	"time"
+
+	"google.golang.org/grpc"
+	"google.golang.org/grpc/metadata"
+)
+
+// client 以 x-trace-id 傳入每篇筆記的 trace id（batch 依 prompt 順序各一個），
+// server 以 x-server-timing trailer 回傳各階段耗時，格式同 HTTP Server-Timing：name;dur=ms
+const (
+	traceHeader        = "x-trace-id"
+	serverTimingHeader = "x-server-timing"
+)
+
+// traceIDs 取出 client 傳來的 trace id；沒有時回傳 nil
+func traceIDs(ctx context.Context) []string {
+	md, ok := metadata.FromIncomingContext(ctx)
+	if !ok {
+		return nil
+	}
+	return md.Get(traceHeader)
+}
+
+// traceIDAt 取第 i 個 trace id，缺少時回傳 "-"（只用於 log）
+func traceIDAt(ids []string, i int) string {
+	if i < len(ids) && ids[i] != "" {
+		return ids[i]
+	}
+	return "-"
+}
+
+// serverTiming 依序記錄各階段耗時；desc 用來標示 batch 中的 item（prompt hash）
+type serverTiming struct {
+	desc  string
+	parts []string
+}
+
+func (t *serverTiming) add(name string, d time.Duration) {
+	t.parts = append(t.parts, fmt.Sprintf("%s;dur=%.1f", name, float64(d.Microseconds())/1000))
+}
+
+func (t *serverTiming) String() string {
+	parts := t.parts
+	if t.desc != "" {
+		parts = append([]string{"item;desc=" + t.desc}, parts...)
+	}
+	return strings.Join(parts, ", ")
+}
+
+// setServerTiming 將耗時寫入 trailer；寫入失敗只記 log，不影響回應
+func setServerTiming(ctx context.Context, timings ...*serverTiming) {
+	kv := make([]string, 0, 2*len(timings))
+	for _, t := range timings {
+		kv = append(kv, serverTimingHeader, t.String())
+	}
+	if err := grpc.SetTrailer(ctx, metadata.Pairs(kv...)); err != nil {
+		log.Printf("⚠️ 無法設定 server timing trailer：%v", err)
+	}
+}
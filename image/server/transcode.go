@@ -0,0 +1,61 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"image"
+	"image/color"
+	"image/draw"
+	"image/jpeg"
+	_ "image/png"
+	"strings"
+)
+
+// DefaultQuality is used when the client does not specify a quality target
+const DefaultQuality = 85
+
+// NegotiateFormat picks the first accepted format this server can encode.
+// Formats the Go standard library cannot encode (e.g. webp) are skipped so
+// the client can transcode them itself; an empty result means "keep png".
+func NegotiateFormat(accept []string) string {
+	for _, f := range accept {
+		switch strings.ToLower(strings.TrimSpace(f)) {
+		case "png":
+			return "png"
+		case "jpeg", "jpg":
+			return "jpeg"
+		}
+	}
+	return "png"
+}
+
+// EncodeImage transcodes the PNG returned by OpenAI into the negotiated format.
+// It returns the encoded bytes and the file_type to report to the client.
+func EncodeImage(pngData []byte, accept []string, quality int32) ([]byte, string, error) {
+	format := NegotiateFormat(accept)
+	if format == "png" {
+		return pngData, "png", nil
+	}
+
+	src, _, err := image.Decode(bytes.NewReader(pngData))
+	if err != nil {
+		return nil, "", fmt.Errorf("解碼圖片失敗：%w", err)
+	}
+
+	q := int(quality)
+	if q <= 0 || q > 100 {
+		q = DefaultQuality
+	}
+
+	// JPEG 沒有 alpha，先鋪白底避免透明區域變黑
+	bounds := src.Bounds()
+	flat := image.NewRGBA(bounds)
+	draw.Draw(flat, bounds, &image.Uniform{C: color.White}, image.Point{}, draw.Src)
+	draw.Draw(flat, bounds, src, bounds.Min, draw.Over)
+
+	var buf bytes.Buffer
+	if err := jpeg.Encode(&buf, flat, &jpeg.Options{Quality: q}); err != nil {
+		return nil, "", fmt.Errorf("JPEG 編碼失敗：%w", err)
+	}
+	return buf.Bytes(), "jpeg", nil
+}
@@ -1,30 +1,183 @@
+"""
+AI Poster CLI
+Fetch notes, generate, review and publish images; heavy modules are imported per subcommand
+
+    python main.py                      # 單次流程：抓取 -> 產圖審核 -> 更新 Notion（同 review）
+    python main.py --daemon             # 常駐模式
+    python main.py review --web --limit 50   # 以瀏覽器審核（縮圖格狀檢視 + 鍵盤操作）
+    python main.py fetch --limit 10     # 列出待處理筆記
+    python main.py generate "a cat"     # 產圖
+    python main.py publish out.webp --caption "..." --platform instagram
+    python main.py pregen               # 為即將 Ready 的筆記預先產圖
+    python main.py history --limit 20   # 最近的審核紀錄
+    python main.py bench --scenario main_flow --requests 5
+"""
+import argparse
+import sys
+from typing import TYPE_CHECKING, List, Optional
+
 from dotenv import load_dotenv
+
+# 必須在 import utils 之前：metrics / tracing 在 import 時讀取 AI_POSTER_* 環境變數
 load_dotenv()
 
-from notion.trigger import NotionTrigger
-from preview.cli import review_prompt_batch
+from utils import metrics  # noqa: E402
+
+if TYPE_CHECKING:
+    from notion.trigger import NotionTrigger
 
-def main():
-    print("🚀 啟動 Notion 圖文審核流程")
-    trigger = NotionTrigger()
-    notes = trigger.get_ready_notes()
+def main(trigger: "NotionTrigger" = None, limit: int = 5, **review_options):
+    """執行一次完整流程（見 scheduler.pipeline.run）"""
+    from scheduler.pipeline import run
+    return run(trigger, limit, **review_options)
 
+def _cmd_review(args: argparse.Namespace) -> int:
+    web = getattr(args, "web", False)
+    if args.daemon:
+        if web:
+            print("❌ --web 不支援常駐模式")
+            return 2
+        from scheduler.daemon import run_daemon
+        run_daemon()
+    elif web:
+        import functools
+        from preview import web as web_review
+        main(limit=args.limit, reviewer=functools.partial(web_review.review_prompt_batch, port=args.port))
+    else:
+        main(limit=getattr(args, "limit", 5))
+    return 0
+
+def _cmd_fetch(args: argparse.Namespace) -> int:
+    from notion.trigger import NotionTrigger
+
+    notes = NotionTrigger().get_ready_notes(limit=args.limit)
     if not notes:
         print("📭 沒有待處理的筆記")
-        return
+    for note in notes:
+        tags = f"  [{', '.join(note['tags'])}]" if note.get("tags") else ""
+        print(f"{note['id']}  {note['title']}{tags}")
+    return 0
+
+def _cmd_generate(args: argparse.Namespace) -> int:
+    from image.client import client
+
+    if args.servers:
+        client.configure_servers([a.strip() for a in args.servers.split(",") if a.strip()])
+    options = {"quality": args.quality}
+    if args.format:
+        options["formats"] = [f.strip() for f in args.format.split(",") if f.strip()]
+
+    if len(args.prompts) == 1:
+        # 單張時使用者在終端機前等待結果
+        filepath, _ = client.generate_image(args.prompts[0], priority=client.PRIORITY_INTERACTIVE, **options)
+        print(filepath)
+    else:
+        for _, _, filepath in client.generate_batch(args.prompts, **options):
+            print(filepath)
+    return 0
+
+def _cmd_publish(args: argparse.Namespace) -> int:
+    if args.platform == "instagram":
+        from publisher.ig import InstagramPublisher as Publisher
+    else:
+        from publisher.threads import ThreadsPublisher as Publisher
+
+    metadata = {"tags": args.tags.split(",")} if args.tags else None
+    result = Publisher().publish(args.image, args.caption, metadata)
+    if not result.success:
+        print(f"❌ 發佈失敗：{result.error}")
+        return 1
+
+    print(f"📤 已發佈：{result.post_url}")
+    if args.note_id:
+        from notion.trigger import NotionTrigger
+        NotionTrigger().mark_as_published(args.note_id, post_url=result.post_url)
+    return 0
+
+def _cmd_pregen(args: argparse.Namespace) -> int:
+    from scheduler.pregen import from_config
+    from utils import config as config_loader
+
+    pregen = from_config(config_loader.load_config(args.config), force=True)
+    if args.status:
+        pregen.status = args.status
+    print(f"🔮 共產生 {pregen.run_once()} 張圖片")
+    metrics.write_textfile()
+    return 0
+
+def _cmd_history(args: argparse.Namespace) -> int:
+    import os
+
+    if not os.path.exists(args.file):
+        print(f"📭 沒有紀錄：{args.file}")
+        return 0
+    with open(args.file, "r", encoding="utf-8") as f:
+        rows = [line.rstrip("\n").split(",", 1) for line in f if line.strip()]
+    for row in rows[-args.limit:] if args.limit else rows:
+        print("  ".join(row))
+    return 0
+
+def _cmd_bench(args: argparse.Namespace) -> int:
+    from bench.driver import main as bench_main
+    return bench_main(args.bench_args)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="AI 圖文自動發布系統")
+    parser.add_argument("--daemon", action="store_true",
+                        help="常駐模式：依 notion.poll_interval_seconds 輪詢，SIGTERM 時等待進行中的筆記完成")
+    sub = parser.add_subparsers(dest="command")
+
+    review = sub.add_parser("review", help="抓取筆記、產圖審核並更新 Notion 狀態（預設）")
+    review.add_argument("--daemon", action="store_true", default=argparse.SUPPRESS)
+    review.add_argument("--web", action="store_true",
+                        help="以瀏覽器審核：縮圖格狀檢視、鍵盤 Y/S/R 決策，新圖片產生後即時出現")
+    review.add_argument("--port", type=int, help="審核網頁的 port（預設 AI_POSTER_REVIEW_PORT 或 8765）")
+    review.add_argument("--limit", type=int, default=5, help="本次抓取的筆記數上限")
+    review.set_defaults(func=_cmd_review)
+
+    fetch = sub.add_parser("fetch", help="列出待處理（Ready 且勾選 Publish）的筆記")
+    fetch.add_argument("--limit", type=int, default=5)
+    fetch.set_defaults(func=_cmd_fetch)
+
+    generate = sub.add_parser("generate", help="產圖並輸出檔案路徑")
+    generate.add_argument("prompts", nargs="+")
+    generate.add_argument("--format", help="可接受的格式（依偏好排序），例如 webp,jpeg")
+    generate.add_argument("--quality", type=int, default=85)
+    generate.add_argument("--servers", help="逗號分隔的 image server 位址，預設讀取 IMAGE_SERVER_ADDRESSES")
+    generate.set_defaults(func=_cmd_generate)
+
+    publish = sub.add_parser("publish", help="發佈圖片到社群平台")
+    publish.add_argument("image")
+    publish.add_argument("--caption", default="")
+    publish.add_argument("--platform", choices=["instagram", "threads"], default="instagram")
+    publish.add_argument("--tags", help="逗號分隔的 hashtag")
+    publish.add_argument("--note-id", help="發佈成功後將此 Notion 筆記標記為 Published 並寫入貼文網址")
+    publish.set_defaults(func=_cmd_publish)
+
+    pregen = sub.add_parser("pregen", help="為即將 Ready 的筆記預先產圖（只使用閒置額度，受 pregen.daily_cap 限制）")
+    pregen.add_argument("--config", help="設定檔路徑，預設為 config.yaml")
+    pregen.add_argument("--status", help="覆寫 pregen.status，例如 Draft")
+    pregen.set_defaults(func=_cmd_pregen)
+
+    history = sub.add_parser("history", help="顯示最近的審核紀錄")
+    history.add_argument("--file", default="history.csv")
+    history.add_argument("--limit", type=int, default=20, help="顯示筆數（0 代表全部）")
+    history.set_defaults(func=_cmd_history)
+
+    # 其餘參數原封不動交給 bench.driver（見 cli()）
+    bench = sub.add_parser("bench", help="執行端到端壓測（參數同 python -m bench.driver）", add_help=False)
+    bench.set_defaults(func=_cmd_bench)
 
-    # 直接使用 note_id 作為識別
-    prompts = [(note["id"], note.get("prompt") or f"{note['title']}\n{note['content']}") for note in notes]
+    return parser
 
-    reviewed_results = review_prompt_batch(prompts)
+def cli(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != "bench":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.bench_args = extra
 
-    for note_id, decision in reviewed_results:
-        if decision == "posted":
-            trigger.mark_as_published(note_id, post_url=None)
-        elif decision == "skipped":
-            trigger.mark_as_skipped(note_id)
-        else:
-            trigger.mark_for_retry(note_id)
+    return args.func(args) if args.command else _cmd_review(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
@@ -2,17 +2,30 @@ import logging
 import os
 from typing import Dict, List, Any, Optional
 
-from notion_client import Client
+from utils import metrics
 
 logger = logging.getLogger(__name__)
 
+NOTION_SECONDS = metrics.histogram("notion_request_seconds", "Notion API latency by operation")
+NOTION_ERRORS = metrics.counter("notion_errors_total", "Failed Notion operations by operation")
+NOTES_FETCHED = metrics.counter("notion_notes_fetched_total", "Notes returned by get_ready_notes")
+
 class NotionTrigger:
     """負責從 Notion 取得待處理筆記，並進行狀態更新"""
 
-    def __init__(self):
-        """初始化 Notion 客戶端"""
-        self.notion = Client(auth=os.environ.get("NOTION_API_KEY"))
-        self.database_id = os.environ.get("NOTION_DATABASE_ID")
+    def __init__(self, client: Optional[Any] = None, database_id: Optional[str] = None):
+        """
+        初始化 Notion 客戶端
+
+        Args:
+            client: 自訂的 Notion client（例如 bench 用的記憶體版本），預設使用 notion_client
+            database_id: 資料庫 ID，預設讀取 NOTION_DATABASE_ID
+        """
+        if client is None:
+            from notion_client import Client
+            client = Client(auth=os.environ.get("NOTION_API_KEY"))
+        self.notion = client
+        self.database_id = database_id or os.environ.get("NOTION_DATABASE_ID")
 
         if not self.database_id:
             logger.error("NOTION_DATABASE_ID 環境變數未設定")
@@ -22,23 +35,41 @@ class NotionTrigger:
         """
         取得狀態為 Ready 且已勾選 Publish 的筆記
         """
+        return self._query_notes("Ready", True, limit)
+
+    def get_upcoming_notes(self, limit: int = 10, status: str = "Draft",
+                           require_publish: bool = True) -> List[Dict[str, Any]]:
+        """
+        取得即將進入 Ready 的筆記（預設為 Draft 且已勾選 Publish），供預先產圖使用
+
+        Args:
+            status: 要查詢的 Status
+            require_publish: 是否只取已勾選 Publish 的筆記
+        """
+        return self._query_notes(status, require_publish, limit)
+
+    def _query_notes(self, status: str, require_publish: bool, limit: int) -> List[Dict[str, Any]]:
+        """依 Status（與 Publish）查詢筆記，依建立時間排序並讀取頁面內容"""
         try:
+            conditions = [
+                {
+                    "property": "Status",
+                    "select": {
+                        "equals": status
+                    }
+                }
+            ]
+            if require_publish:
+                conditions.append({
+                    "property": "Publish",
+                    "checkbox": {
+                        "equals": True
+                    }
+                })
+
             filter_params = {
                 "filter": {
-                    "and": [
-                        {
-                            "property": "Status",
-                            "select": {
-                                "equals": "Ready"
-                            }
-                        },
-                        {
-                            "property": "Publish",
-                            "checkbox": {
-                                "equals": True
-                            }
-                        }
-                    ]
+                    "and": conditions
                 },
                 "sorts": [
                     {
@@ -49,10 +80,11 @@ class NotionTrigger:
                 "page_size": limit
             }
 
-            response = self.notion.databases.query(
-                database_id=self.database_id,
-                **filter_params
-            )
+            with NOTION_SECONDS.time(op="query"):
+                response = self.notion.databases.query(
+                    database_id=self.database_id,
+                    **filter_params
+                )
 
             results = []
             for page in response.get("results", []):
@@ -74,16 +106,19 @@ class NotionTrigger:
                     "prompt":prompt
                 })
 
+            NOTES_FETCHED.inc(len(results))
             return results
 
         except Exception as e:
-            logger.exception(f"取得待處理筆記失敗: {str(e)}")
+            NOTION_ERRORS.inc(op="query")
+            logger.exception(f"取得 {status} 筆記失敗: {str(e)}")
             return []
 
     def _get_page_content(self, page_id: str) -> str:
         """取得指定頁面的內容"""
         try:
-            blocks = self.notion.blocks.children.list(block_id=page_id).get("results", [])
+            with NOTION_SECONDS.time(op="children"):
+                blocks = self.notion.blocks.children.list(block_id=page_id).get("results", [])
             content = []
 
             for block in blocks:
@@ -96,6 +131,7 @@ class NotionTrigger:
             return "\n".join(content)
 
         except Exception as e:
+            NOTION_ERRORS.inc(op="children")
             logger.exception(f"取得頁面內容失敗 {page_id}: {str(e)}")
             return ""
 
@@ -129,42 +165,54 @@ class NotionTrigger:
             return "".join([t.get("plain_text", "") for t in prop.get("rich_text", [])])
         return ""
 
-    def mark_as_published(self, page_id: str, post_url: str) -> None:
-        """將筆記標記為已發佈"""
+    def mark_as_published(self, page_id: str, post_url: Optional[str] = None) -> bool:
+        """將筆記標記為已發佈並寫入貼文網址（審核通過、尚未發佈時為 None），回傳是否成功"""
         try:
-            self.notion.pages.update(
-                page_id=page_id,
-                properties={
-                    "Status": {"select": {"name": "Published"}},
-                    "Post URL": {"url": None},
-                }
-            )
+            with NOTION_SECONDS.time(op="update"):
+                self.notion.pages.update(
+                    page_id=page_id,
+                    properties={
+                        "Status": {"select": {"name": "Published"}},
+                        "Post URL": {"url": post_url},
+                    }
+                )
             logger.info(f"標記 {page_id} 為 Published")
+            return True
         except Exception as e:
+            NOTION_ERRORS.inc(op="update")
             logger.exception(f"標記 {page_id} 為 Published 失敗: {str(e)}")
+            return False
 
-    def mark_as_skipped(self, page_id: str) -> None:
-        """將筆記標記為略過"""
+    def mark_as_skipped(self, page_id: str) -> bool:
+        """將筆記標記為略過，回傳是否成功"""
         try:
-            self.notion.pages.update(
-                page_id=page_id,
-                properties={
-                    "Status": {"select": {"name": "Skipped"}},
-                }
-            )
+            with NOTION_SECONDS.time(op="update"):
+                self.notion.pages.update(
+                    page_id=page_id,
+                    properties={
+                        "Status": {"select": {"name": "Skipped"}},
+                    }
+                )
             logger.info(f"標記 {page_id} 為 Skipped")
+            return True
         except Exception as e:
+            NOTION_ERRORS.inc(op="update")
             logger.exception(f"標記 {page_id} 為 Skipped 失敗: {str(e)}")
+            return False
 
-    def mark_for_retry(self, page_id: str) -> None:
-        """將筆記標記為 Retry 以便再次處理"""
+    def mark_for_retry(self, page_id: str) -> bool:
+        """將筆記標記為 Retry 以便再次處理，回傳是否成功"""
         try:
-            self.notion.pages.update(
-                page_id=page_id,
-                properties={
-                    "Status": {"select": {"name": "Retry"}}
-                }
-            )
+            with NOTION_SECONDS.time(op="update"):
+                self.notion.pages.update(
+                    page_id=page_id,
+                    properties={
+                        "Status": {"select": {"name": "Retry"}}
+                    }
+                )
             logger.info(f"標記 {page_id} 為 Retry")
+            return True
         except Exception as e:
-            logger.exception(f"標記 {page_id} 為 Retry 失敗: {str(e)}")
\ No newline at end of file
+            NOTION_ERRORS.inc(op="update")
+            logger.exception(f"標記 {page_id} 為 Retry 失敗: {str(e)}")
+            return False
\ No newline at end of file
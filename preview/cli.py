@@ -1,40 +1,126 @@
-from image.client.client import generate_image, generate_batch
+import contextlib
+from typing import TYPE_CHECKING, Callable, ContextManager, Optional
+
+from image.client.client import PRIORITY_INTERACTIVE, generate_image, generate_batch
 from utils.history import record_decision
-from PIL import Image
+from utils import metrics, tracing
+
+if TYPE_CHECKING:
+    from utils.journal import Journal
+
+REVIEW_DECISION_SECONDS = metrics.histogram("review_decision_seconds", "Time from preview to reviewer decision")
+REVIEW_DECISIONS = metrics.counter("review_decisions_total", "Reviewer decisions by decision (y / s / r)")
 
 def preview_image(filepath: str):
+    from PIL import Image
+
     img = Image.open(filepath)
     img.show()
 
-def review_prompt_batch(prompts: list[tuple[str, str]]) -> list[tuple[str, str]]:
+def ask_decision(prompt: str, filepath: str) -> str:
+    """互動式審核：回傳 'y'（發佈）、'r'（重產）或 's'（略過）"""
+    while True:
+        decision = input(f"\n是否發佈這張圖片？\n👉 Prompt: {prompt}\n[Y] 發佈 / [R] 重產 / [S] 略過：").strip().lower()
+        if decision in ["y", "r", "s"]:
+            return decision
+
+def _review_one(prompt_hash: str, prompt: str, filepath: str,
+                decide: Callable[[str, str], str], preview: Callable[[str], None]) -> str:
+    """審核單張圖片，回傳 'posted' / 'skipped' / 'retry'"""
+    with tracing.span("review_wait"), REVIEW_DECISION_SECONDS.time():
+        preview(filepath)
+        decision = decide(prompt, filepath)
+    REVIEW_DECISIONS.inc(decision=decision)
+
+    if decision == "y":
+        print("📤 已記錄：發佈")
+        record_decision(prompt_hash, "posted")
+    elif decision == "s":
+        print("❌ 已記錄：略過")
+        record_decision(prompt_hash, "skipped")
+    elif decision == "r":
+        print("🔁 重新產圖中...")
+        # 審核者正在等，插隊到批次與預先產圖前面
+        new_file, new_hash = generate_image(prompt, priority=PRIORITY_INTERACTIVE, refresh=True)
+        with tracing.span("review_wait", regenerated=True):
+            preview(new_file)
+        record_decision(new_hash, "posted")
+
+    status_map = {"y": "posted", "s": "skipped", "r": "retry"}
+    return status_map[decision]
+
+def resume_from_journal(prompts: list[tuple[str, str]], journal: Optional["Journal"] = None):
+    """
+    依 journal 分出已審核、已產圖與待產圖的筆記（CLI 與 web 審核共用）
+
+    Returns:
+        (decided: note_id -> decision, images: note_id -> (prompt_hash, prompt, filepath), pending: [(note_id, prompt)])
+    """
+    decided = {}
+    images = {}
+    pending = []
+    for note_id, prompt in prompts:
+        decision = journal.decision(note_id) if journal else None
+        previous = journal.generated(note_id, prompt) if journal else None
+        if decision:
+            decided[note_id] = decision
+        elif previous:
+            images[note_id] = previous
+        else:
+            pending.append((note_id, prompt))
+
+    if decided or images:
+        print(f"♻️ 續跑：沿用 {len(decided)} 筆審核結果、{len(images)} 張已產生的圖片")
+    return decided, images, pending
+
+def review_prompt_batch(prompts: list[tuple[str, str]],
+                        decide: Callable[[str, str], str] = ask_decision,
+                        preview: Callable[[str], None] = preview_image,
+                        review_lock: Optional[ContextManager] = None,
+                        journal: Optional["Journal"] = None) -> list[tuple[str, str]]:
+    """
+    批次產圖並逐張審核
+
+    Args:
+        prompts: (note_id, prompt) 清單
+        decide: 決策函式 (prompt, filepath) -> 'y' / 'r' / 's'，預設為 CLI 互動輸入
+        preview: 顯示圖片的函式，預設開啟圖片檢視器
+        review_lock: 審核時持有的 lock；daemon 多篇筆記同時產圖時，確保一次只審核一張
+        journal: 中斷後續跑用的 journal；已審核的筆記直接沿用決策，已產生的圖片不重新產圖
+
+    Returns:
+        (note_id, 'posted' / 'skipped' / 'retry')；產圖失敗的筆記不會出現在結果中
+    """
+    decided, images, pending = resume_from_journal(prompts, journal)
+
+    if pending:
+        response_list = generate_batch([p for _, p in pending],
+                                       trace_ids=[tracing.trace_id_for(note_id) for note_id, _ in pending])
+        # 依 prompt 對應回筆記（server 可能略過產圖失敗的項目）
+        waiting = {}
+        for note_id, prompt in pending:
+            waiting.setdefault(prompt, []).append(note_id)
+        for prompt_hash, prompt, filepath in response_list:
+            if not waiting.get(prompt):
+                continue
+            note_id = waiting[prompt].pop(0)
+            images[note_id] = (prompt_hash, prompt, filepath)
+            if journal:
+                journal.record("generated", note_id, prompt=prompt, prompt_hash=prompt_hash, filepath=filepath)
+
     results = []
-    ids = [note_id for note_id, _ in prompts]
-    prompt_texts = [p for _, p in prompts]
-
-    response_list = generate_batch(prompt_texts)
-
-    for i, (prompt_hash, prompt, filepath) in enumerate(response_list):
-        note_id = ids[i]
-        preview_image(filepath)
-
-        while True:
-            decision = input(f"\n是否發佈這張圖片？\n👉 Prompt: {prompt}\n[Y] 發佈 / [R] 重產 / [S] 略過：").strip().lower()
-            if decision in ["y", "r", "s"]:
-                break
-
-        if decision == "y":
-            print("📤 已記錄：發佈")
-            record_decision(prompt_hash, "posted")
-        elif decision == "s":
-            print("❌ 已記錄：略過")
-            record_decision(prompt_hash, "skipped")
-        elif decision == "r":
-            print("🔁 重新產圖中...")
-            new_file, new_hash = generate_image(prompt)
-            preview_image(new_file)
-            record_decision(new_hash, "posted")
-
-        status_map = {"y": "posted", "s": "skipped", "r": "retry"}
-        results.append((note_id, status_map[decision]))
-
-    return results
\ No newline at end of file
+    for note_id, _ in prompts:
+        if note_id in decided:
+            results.append((note_id, decided[note_id]))
+            continue
+        if note_id not in images:
+            print(f"⚠️ 筆記 {note_id} 產圖失敗，下次執行時重試")
+            continue
+        prompt_hash, prompt, filepath = images[note_id]
+        with tracing.use_trace(tracing.trace_id_for(note_id)), review_lock or contextlib.nullcontext():
+            decision = _review_one(prompt_hash, prompt, filepath, decide, preview)
+        if journal:
+            journal.record("decision", note_id, decision=decision, prompt_hash=prompt_hash)
+        results.append((note_id, decision))
+
+    return results
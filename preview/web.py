@@ -0,0 +1,549 @@
+"""
+Web review
+Local browser review UI: thumbnail grid, keyboard decisions and images streamed in as they finish
+
+    python main.py review --web --limit 50      # 開啟 http://127.0.0.1:8765
+
+與 preview.cli.review_prompt_batch 相同的輸入與回傳，可直接替換：
+- 每張圖各自在背景產生（同時最多 concurrency 張），完成一張就以 SSE（/events）推送到頁面，不必等全部產完才開始審核
+- 縮圖在圖片完成時就先產生並快取在記憶體，頁面會預先載入下一頁的縮圖
+- 鍵盤操作：Y 發佈、S 略過、R 重新產圖（插隊到 server queue 最前面，完成後原地更新）、
+  ←/→/↑/↓ 或 H/J/K/L 移動、Enter 放大、N/P 換頁、F 結束審核
+- R 與 CLI 相同：重產的圖直接發佈（history.csv 記為 posted），筆記記為 retry，不再回到待審核
+- 決策與 CLI 相同寫入 history.csv 與 journal，回傳後由 scheduler.pipeline.process_notes 寫回 Notion 狀態；
+  尚未審核的筆記不會出現在結果中，維持 Ready 下次再處理
+"""
+import io
+import json
+import os
+import queue
+import threading
+import time
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from image.client.client import PRIORITY_INTERACTIVE, generate_image
+from preview.cli import REVIEW_DECISION_SECONDS, REVIEW_DECISIONS, resume_from_journal
+from utils import tracing
+from utils.history import record_decision
+
+if TYPE_CHECKING:
+    from utils.journal import Journal
+
+DEFAULT_PORT = 8765
+PAGE_SIZE = 12
+THUMB_SIZE = (320, 320)
+CONTENT_TYPES = {".png": "image/png", ".jpeg": "image/jpeg", ".jpg": "image/jpeg", ".webp": "image/webp"}
+DECISIONS = {"y": "posted", "s": "skipped"}
+# retry：按 R 重產後已發佈（與 CLI 相同），同樣視為已審核
+DECIDED = ("posted", "skipped", "retry")
+
+class ReviewSession:
+    """Tracks every note's image and decision and fans out state changes to SSE subscribers"""
+
+    def __init__(self, prompts: List[tuple], journal: Optional["Journal"] = None, concurrency: int = 5):
+        """
+        Args:
+            prompts: (note_id, prompt) 清單
+            journal: 中斷後續跑用的 journal
+            concurrency: 同時產圖的張數；每張完成就推送，不等同批的其他圖片
+        """
+        self.journal = journal
+        self.items: List[Dict[str, Any]] = [
+            {"index": i, "note_id": note_id, "prompt": prompt, "status": "generating",
+             "prompt_hash": None, "filepath": None, "version": 0, "ready_at": None}
+            for i, (note_id, prompt) in enumerate(prompts)
+        ]
+        self._by_note = {item["note_id"]: item for item in self.items}
+        self._thumbs: Dict[int, tuple] = {}
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._last_decision = time.monotonic()
+        # 重產與初次產圖分開排隊，按 R 時不必等前面的產圖
+        self._workers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="review-web")
+        self._generators = ThreadPoolExecutor(max_workers=max(1, concurrency),
+                                              thread_name_prefix="review-web-generate")
+        self.done = threading.Event()
+
+        decided, images, self._pending = resume_from_journal(prompts, journal)
+        for note_id, decision in decided.items():
+            self._by_note[note_id]["status"] = decision
+        for note_id, image in images.items():
+            self._image_ready(self._by_note[note_id], *image, record=False)
+
+    # ---- 狀態與事件 ----
+
+    @staticmethod
+    def public(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: item[k] for k in ("index", "note_id", "prompt", "status", "prompt_hash", "version")}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"items": [self.public(item) for item in self.items], "page_size": PAGE_SIZE,
+                    "done": self.done.is_set()}
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue()
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def _publish(self, event: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            q.put((event, data))
+
+    def _update(self, item: Dict[str, Any], **fields) -> None:
+        with self._lock:
+            item.update(fields)
+            data = self.public(item)
+        self._publish("item", data)
+        self._check_done()
+
+    def _check_done(self) -> None:
+        if all(i["status"] in DECIDED + ("failed",) for i in self.items):
+            self.finish()
+
+    def finish(self) -> None:
+        """結束審核；未審核的筆記不會出現在結果中"""
+        if not self.done.is_set():
+            self.done.set()
+            self._publish("done", {})
+
+    # ---- 產圖 ----
+
+    def start(self) -> None:
+        """在背景逐張產圖，每張完成就推送到頁面"""
+        self._check_done()
+        # 相同 prompt 的筆記共用一次產圖
+        waiting: Dict[str, List[str]] = {}
+        for note_id, prompt in self._pending:
+            waiting.setdefault(prompt, []).append(note_id)
+        for prompt, note_ids in waiting.items():
+            self._generators.submit(self._generate_one, prompt, note_ids)
+
+    def _generate_one(self, prompt: str, note_ids: List[str]) -> None:
+        if self.done.is_set():
+            return
+        with tracing.use_trace(tracing.trace_id_for(note_ids[0])):
+            try:
+                filepath, prompt_hash = generate_image(prompt)
+            except Exception as e:
+                print(f"⚠️ 產圖失敗：{e}")
+                for note_id in note_ids:
+                    print(f"⚠️ 筆記 {note_id} 產圖失敗，下次執行時重試")
+                    self._update(self._by_note[note_id], status="failed")
+                return
+        for note_id in note_ids:
+            self._image_ready(self._by_note[note_id], prompt_hash, prompt, filepath)
+
+    def _image_ready(self, item: Dict[str, Any], prompt_hash: str, prompt: str, filepath: str,
+                     record: bool = True, status: str = "ready") -> None:
+        if record and self.journal:
+            self.journal.record("generated", item["note_id"], prompt=prompt, prompt_hash=prompt_hash,
+                                filepath=filepath)
+        # 先產生縮圖再通知頁面，頁面載入時一定是快取命中
+        version = item["version"] + 1
+        self._thumbs[item["index"]] = (version, make_thumbnail(filepath))
+        self._update(item, status=status, prompt_hash=prompt_hash, filepath=filepath, version=version,
+                     ready_at=time.monotonic())
+
+    def _regenerate(self, item: Dict[str, Any]) -> None:
+        previous_hash = item["prompt_hash"]
+        with tracing.use_trace(tracing.trace_id_for(item["note_id"])):
+            try:
+                filepath, prompt_hash = generate_image(item["prompt"], priority=PRIORITY_INTERACTIVE, refresh=True)
+            except Exception as e:
+                print(f"⚠️ 重新產圖失敗：{e}")
+                self._update(item, status="ready")
+                return
+        # 與 CLI 的 _review_one 相同：重產的圖記為發佈，journal 記 retry，續跑時視為已審核
+        record_decision(prompt_hash, "posted")
+        if self.journal:
+            self.journal.record("decision", item["note_id"], decision="retry", prompt_hash=previous_hash)
+        print(f"📤 已記錄：發佈重產的圖片（{item['note_id']}）")
+        self._image_ready(item, prompt_hash, item["prompt"], filepath, record=False, status="retry")
+
+    # ---- 審核 ----
+
+    def decide(self, index: int, key: str) -> Optional[Dict[str, Any]]:
+        """
+        套用鍵盤決策：y 發佈、s 略過、r 重新產圖（完成後與 CLI 相同記為 retry）
+
+        Returns:
+            更新後的項目；項目不存在或狀態不允許時回傳 None
+        """
+        if not 0 <= index < len(self.items) or key not in ("y", "s", "r"):
+            return None
+        item = self.items[index]
+        with self._lock:
+            # 檢查與變更狀態在同一個 lock 內：按住按鍵連續送出時只有第一個決策生效
+            if item["status"] != "ready":
+                return None
+            item["status"] = "regenerating" if key == "r" else "deciding"
+            now = time.monotonic()
+            # 網頁可以連續審核，等待時間從圖片完成或上一個決策開始計算
+            waited = now - max(item["ready_at"] or now, self._last_decision)
+            self._last_decision = now
+        REVIEW_DECISION_SECONDS.observe(waited)
+        REVIEW_DECISIONS.inc(decision=key)
+
+        if key == "r":
+            print(f"🔁 重新產圖中：{item['note_id']}")
+            self._update(item)
+            self._workers.submit(self._regenerate, item)
+            return self.public(item)
+
+        decision = DECISIONS[key]
+        end = tracing.now()
+        tracing.add_span("review_wait", end - waited, end, tracing.trace_id_for(item["note_id"]), ui="web")
+        record_decision(item["prompt_hash"], decision)
+        if self.journal:
+            self.journal.record("decision", item["note_id"], decision=decision, prompt_hash=item["prompt_hash"])
+        print(f"{'📤' if key == 'y' else '❌'} 已記錄：{'發佈' if key == 'y' else '略過'}（{item['note_id']}）")
+        self._update(item, status=decision)
+        return self.public(item)
+
+    def results(self) -> List[tuple]:
+        """依輸入順序回傳已審核的 (note_id, 'posted' / 'skipped' / 'retry')"""
+        with self._lock:
+            return [(item["note_id"], item["status"]) for item in self.items if item["status"] in DECIDED]
+
+    # ---- 圖片 ----
+
+    def thumbnail(self, index: int) -> Optional[bytes]:
+        item = self.items[index]
+        cached = self._thumbs.get(index)
+        if cached and cached[0] == item["version"]:
+            return cached[1]
+        if not item["filepath"]:
+            return None
+        data = make_thumbnail(item["filepath"])
+        self._thumbs[index] = (item["version"], data)
+        return data
+
+    def close(self) -> None:
+        self._generators.shutdown(wait=False, cancel_futures=True)
+        self._workers.shutdown(wait=False)
+
+def make_thumbnail(filepath: str) -> bytes:
+    from PIL import Image
+
+    with Image.open(filepath) as img:
+        img = img.convert("RGB")
+        img.thumbnail(THUMB_SIZE)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+def _handler(session: ReviewSession):
+    class ReviewHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str, cache: bool = False) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            # 圖片網址帶有 version，內容變更時網址也會變，可長期快取
+            self.send_header("Cache-Control", "max-age=86400, immutable" if cache else "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data: Any, status: int = 200) -> None:
+            self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        def _trusted_host(self) -> bool:
+            """Host 必須是本機位址，擋下 DNS rebinding"""
+            port = self.server.server_address[1]
+            return self.headers.get("Host", "") in (f"127.0.0.1:{port}", f"localhost:{port}")
+
+        def _same_origin(self) -> bool:
+            """瀏覽器跨站送出的 POST 會帶其他網站的 Origin；沒有 Origin 的請求（curl 等）只檢查 Host"""
+            port = self.server.server_address[1]
+            origin = self.headers.get("Origin")
+            return origin is None or origin in (f"http://127.0.0.1:{port}", f"http://localhost:{port}")
+
+        def _index(self, path: str) -> Optional[int]:
+            try:
+                index = int(path.rsplit("/", 1)[-1])
+            except ValueError:
+                return None
+            return index if 0 <= index < len(session.items) else None
+
+        def do_GET(self):
+            if not self._trusted_host():
+                self._send(403, b"", "text/plain")
+                return
+            path = urlparse(self.path).path
+            if path == "/":
+                self._send(200, INDEX_HTML.encode("utf-8"), "text/html; charset=utf-8")
+            elif path == "/api/items":
+                self._json(session.snapshot())
+            elif path == "/events":
+                self._events()
+            elif path.startswith("/thumb/"):
+                index = self._index(path)
+                data = session.thumbnail(index) if index is not None else None
+                if data is None:
+                    self._send(404, b"", "text/plain")
+                else:
+                    self._send(200, data, "image/jpeg", cache=True)
+            elif path.startswith("/image/"):
+                index = self._index(path)
+                filepath = session.items[index]["filepath"] if index is not None else None
+                if not filepath or not os.path.exists(filepath):
+                    self._send(404, b"", "text/plain")
+                    return
+                with open(filepath, "rb") as f:
+                    data = f.read()
+                ext = os.path.splitext(filepath)[1].lower()
+                self._send(200, data, CONTENT_TYPES.get(ext, "application/octet-stream"), cache=True)
+            else:
+                self._send(404, b"", "text/plain")
+
+        def do_POST(self):
+            if not (self._trusted_host() and self._same_origin()):
+                self._json({"error": "forbidden"}, 403)
+                return
+            # 只接受 application/json：跨站的 text/plain 表單 POST 不需要 preflight，不能當成決策
+            if self.headers.get_content_type() != "application/json":
+                self._json({"error": "expected application/json"}, 415)
+                return
+            path = urlparse(self.path).path
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._json({"error": "invalid json"}, 400)
+                return
+            if not isinstance(body, dict):
+                self._json({"error": "invalid json"}, 400)
+                return
+            if path == "/api/decision":
+                index = body.get("index")
+                if not isinstance(index, int) or isinstance(index, bool):
+                    self._json({"error": "index must be an integer"}, 400)
+                    return
+                item = session.decide(index, str(body.get("decision", "")).lower())
+                self._json(item or {"error": "not reviewable"}, 200 if item else 409)
+            elif path == "/api/finish":
+                session.finish()
+                self._json({"done": True})
+            else:
+                self._send(404, b"", "text/plain")
+
+        def _events(self):
+            """SSE：item（項目狀態變更）與 done（審核結束）"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            q = session.subscribe()
+            try:
+                if session.done.is_set():
+                    q.put(("done", {}))
+                while True:
+                    try:
+                        event, data = q.get(timeout=15)
+                    except queue.Empty:
+                        self.wfile.write(b": ping\n\n")
+                        self.wfile.flush()
+                        continue
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if event == "done":
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                session.unsubscribe(q)
+
+    return ReviewHandler
+
+def serve(session: ReviewSession, port: Optional[int] = None, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """在背景執行緒啟動審核網頁，回傳 server（shutdown() 結束）"""
+    if port is None:
+        port = int(os.environ.get("AI_POSTER_REVIEW_PORT", DEFAULT_PORT))
+    server = ThreadingHTTPServer((host, port), _handler(session))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="review-web", daemon=True).start()
+    return server
+
+def review_prompt_batch(prompts: List[tuple], journal: Optional["Journal"] = None, port: Optional[int] = None,
+                        open_browser: bool = True, concurrency: int = 5) -> List[tuple]:
+    """
+    以網頁審核取代 CLI：邊產圖邊審核，全部審核完成或按 F 結束後回傳
+
+    Args:
+        prompts: (note_id, prompt) 清單
+        journal: 中斷後續跑用的 journal；已審核的筆記直接沿用決策，已產生的圖片不重新產圖
+        port: 監聽的 port，預設讀取 AI_POSTER_REVIEW_PORT 或 8765（只綁定 127.0.0.1）
+        open_browser: 是否自動開啟瀏覽器
+        concurrency: 同時產圖的張數
+
+    Returns:
+        (note_id, 'posted' / 'skipped' / 'retry')；未審核或產圖失敗的筆記不會出現在結果中
+    """
+    session = ReviewSession(prompts, journal=journal, concurrency=concurrency)
+    server = serve(session, port)
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/"
+    print(f"🖥️ 審核網頁：{url}（Y 發佈 / S 略過 / R 重產 / F 結束）")
+    if open_browser:
+        webbrowser.open(url)
+
+    session.start()
+    try:
+        while not session.done.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        print("🛑 結束網頁審核，未審核的筆記下次再處理")
+        session.finish()
+    finally:
+        # 讓頁面收到 done 事件後再關閉
+        time.sleep(0.2)
+        server.shutdown()
+        server.server_close()
+        session.close()
+    return session.results()
+
+INDEX_HTML = """<!doctype html>
+<html lang="zh-Hant">
+<head>
+<meta charset="utf-8">
+<title>AI Poster 審核</title>
+<style>
+  body { font-family: system-ui, sans-serif; margin: 0; background: #111; color: #eee; }
+  header { display: flex; gap: 1.5em; align-items: center; padding: .6em 1em; background: #1c1c1c; position: sticky; top: 0; }
+  header .keys { color: #999; font-size: .85em; }
+  #grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 12px; padding: 12px; }
+  .card { background: #1c1c1c; border: 3px solid transparent; border-radius: 8px; overflow: hidden; }
+  .card.focus { border-color: #4aa3ff; }
+  .card .img { aspect-ratio: 1; display: flex; align-items: center; justify-content: center; background: #000; color: #777; }
+  .card img { width: 100%; height: 100%; object-fit: cover; }
+  .card .meta { padding: .4em .6em; font-size: .8em; display: flex; justify-content: space-between; gap: .5em; }
+  .card .prompt { white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+  .posted, .retry { opacity: .55; } .posted .badge, .retry .badge { color: #5d5; }
+  .skipped { opacity: .35; } .skipped .badge { color: #d55; }
+  .failed .badge { color: #d55; } .generating .badge, .regenerating .badge { color: #db5; }
+  #large { display: none; position: fixed; inset: 0; background: rgba(0,0,0,.9); align-items: center; justify-content: center; }
+  #large img { max-width: 95vw; max-height: 95vh; }
+  #large.show { display: flex; }
+</style>
+</head>
+<body>
+<header>
+  <strong>AI Poster 審核</strong>
+  <span id="status"></span>
+  <span id="page"></span>
+  <span class="keys">Y 發佈 · S 略過 · R 重產 · ←→↑↓ / HJKL 移動 · Enter 放大 · N/P 換頁 · F 結束</span>
+</header>
+<div id="grid"></div>
+<div id="large"><img></div>
+<script>
+const COLS = 4;
+const LABELS = {generating: "產圖中", regenerating: "重產中", ready: "待審核", deciding: "記錄中", posted: "發佈", retry: "發佈", skipped: "略過", failed: "失敗"};
+let items = [], pageSize = 12, focus = 0, done = false;
+
+const grid = document.getElementById("grid");
+const large = document.getElementById("large");
+const page = () => Math.floor(focus / pageSize);
+const thumbUrl = it => `/thumb/${it.index}?v=${it.version}`;
+const imageUrl = it => `/image/${it.index}?v=${it.version}`;
+const hasImage = it => it.version > 0;
+
+function card(it) {
+  const el = document.createElement("div");
+  el.className = `card ${it.status}` + (it.index === focus ? " focus" : "");
+  el.onclick = () => { focus = it.index; render(); };
+  const img = hasImage(it) ? `<img src="${thumbUrl(it)}" loading="eager">` : LABELS[it.status];
+  el.innerHTML = `<div class="img">${img}</div><div class="meta"><span class="prompt"></span><span class="badge">${LABELS[it.status]}</span></div>`;
+  el.querySelector(".prompt").textContent = it.prompt;
+  el.title = it.prompt;
+  return el;
+}
+
+function prefetch(p) {
+  // 預先載入下一頁的縮圖與目前項目的原圖，換頁 / 放大時不必等待
+  items.slice(p * pageSize, (p + 1) * pageSize).filter(hasImage).forEach(it => { new Image().src = thumbUrl(it); });
+  if (items[focus] && hasImage(items[focus])) new Image().src = imageUrl(items[focus]);
+}
+
+function render() {
+  const p = page();
+  grid.replaceChildren(...items.slice(p * pageSize, (p + 1) * pageSize).map(card));
+  const count = s => items.filter(it => it.status === s).length;
+  document.getElementById("status").textContent = done ? "審核結束，可關閉此頁" :
+    `待審核 ${count("ready")} · 產圖中 ${count("generating") + count("regenerating")} · 發佈 ${count("posted") + count("retry")} · 略過 ${count("skipped")}`;
+  document.getElementById("page").textContent = `第 ${p + 1} / ${Math.max(1, Math.ceil(items.length / pageSize))} 頁`;
+  if (large.classList.contains("show")) showLarge();
+  prefetch(p + 1);
+}
+
+function move(delta) {
+  focus = Math.min(items.length - 1, Math.max(0, focus + delta));
+  render();
+}
+
+function nextReviewable() {
+  for (let i = 1; i <= items.length; i++) {
+    const it = items[(focus + i) % items.length];
+    if (it.status === "ready" || it.status === "generating") { focus = it.index; return; }
+  }
+}
+
+function showLarge() {
+  const it = items[focus];
+  if (it && hasImage(it)) { large.querySelector("img").src = imageUrl(it); large.classList.add("show"); }
+}
+
+async function decide(key) {
+  const it = items[focus];
+  if (!it || it.status !== "ready") return;
+  const res = await fetch("/api/decision", {method: "POST", headers: {"Content-Type": "application/json"},
+                                            body: JSON.stringify({index: it.index, decision: key})});
+  if (res.ok) {
+    items[it.index] = await res.json();
+    if (key !== "r") nextReviewable();
+    render();
+  }
+}
+
+document.addEventListener("keydown", e => {
+  if (done || e.metaKey || e.ctrlKey || e.altKey) return;
+  const k = e.key.toLowerCase();
+  if (k === "y" || k === "s" || k === "r") decide(k);
+  else if (k === "arrowright" || k === "l") move(1);
+  else if (k === "arrowleft" || k === "h") move(-1);
+  else if (k === "arrowdown" || k === "j") move(COLS);
+  else if (k === "arrowup" || k === "k") move(-COLS);
+  else if (k === "n") move(pageSize - focus % pageSize);
+  else if (k === "p") move(-(focus % pageSize) - pageSize);
+  else if (k === "enter") { large.classList.contains("show") ? large.classList.remove("show") : showLarge(); }
+  else if (k === "escape") large.classList.remove("show");
+  else if (k === "f") fetch("/api/finish", {method: "POST", headers: {"Content-Type": "application/json"}, body: "{}"});
+  else return;
+  e.preventDefault();
+});
+large.onclick = () => large.classList.remove("show");
+
+fetch("/api/items").then(r => r.json()).then(data => {
+  items = data.items; pageSize = data.page_size; done = data.done;
+  render();
+  const events = new EventSource("/events");
+  events.addEventListener("item", e => { const it = JSON.parse(e.data); items[it.index] = it; render(); });
+  events.addEventListener("done", () => { done = true; events.close(); render(); });
+});
+</script>
+</body>
+</html>
+"""
@@ -7,8 +7,12 @@ import os
 import json
 from typing import Dict, Any, List
 
+from utils import metrics, tracing
+
 logger = logging.getLogger(__name__)
 
+PROMPT_BUILD_SECONDS = metrics.histogram("prompt_build_seconds", "PromptEngine.create_prompt latency")
+
 class PromptEngine:
     """Creates prompts for image generation based on note content and templates"""
     
@@ -73,6 +77,7 @@ class PromptEngine:
                 }
             }
     
+    @PROMPT_BUILD_SECONDS.timed()
     def create_prompt(self, note: Dict[str, Any]) -> str:
         """
         Create a prompt for image generation based on note content
@@ -83,6 +88,11 @@ class PromptEngine:
         Returns:
             Prompt string for image generation
         """
+        with tracing.span("prompt_build"):
+            return self._build_prompt(note)
+
+    def _build_prompt(self, note: Dict[str, Any]) -> str:
+        """Fill the selected template with the note's title / content"""
         try:
             # Determine which template to use based on tags
             template_name = self._select_template(note.get("tags", []))
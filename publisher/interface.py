@@ -2,10 +2,17 @@
 Publisher Interface Module
 Defines the abstract interface for social media publishers
 """
+import functools
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Dict, Any, Optional
 
+from utils import metrics, tracing
+
+PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Publisher.publish latency by platform")
+PUBLISH_TOTAL = metrics.counter("publish_total", "Publish attempts by platform and outcome")
+
 @dataclass
 class PublishResult:
     """Result of publishing to a platform"""
@@ -14,6 +21,28 @@ class PublishResult:
     post_id: Optional[str] = None
     error: Optional[str] = None
 
+def instrumented(platform: str):
+    """
+    記錄 publish() 的延遲與結果（success / failure），並在目前的 trace 加上 publish span
+
+    Args:
+        platform: metrics 的 platform label，例如 "instagram"
+    """
+    def decorator(publish):
+        @functools.wraps(publish)
+        def wrapper(*args, **kwargs) -> PublishResult:
+            if not metrics.enabled():
+                with tracing.span("publish", platform=platform):
+                    return publish(*args, **kwargs)
+            start = time.perf_counter()
+            with tracing.span("publish", platform=platform):
+                result = publish(*args, **kwargs)
+            PUBLISH_SECONDS.observe(time.perf_counter() - start, platform=platform)
+            PUBLISH_TOTAL.inc(platform=platform, outcome="success" if result.success else "failure")
+            return result
+        return wrapper
+    return decorator
+
 class Publisher(ABC):
     """Abstract base class for social media publishers"""
     
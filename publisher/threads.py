@@ -6,7 +6,7 @@ import logging
 import os
 from typing import Dict, Any, Optional
 
-from publisher.interface import Publisher, PublishResult
+from publisher.interface import Publisher, PublishResult, instrumented
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,7 @@ class ThreadsPublisher(Publisher):
         # In a real implementation, you would initialize the Threads API client
         self.api = None
     
+    @instrumented("threads")
     def publish(self, image_path: str, caption: str, metadata: Dict[str, Any] = None) -> PublishResult:
         """
         Publish an image to Threads
@@ -0,0 +1,175 @@
+"""
+Scheduler Daemon
+Long-running poller that keeps the Notion client, gRPC channels and caches warm
+
+    python main.py --daemon
+
+依 config.yaml 的 notion.poll_interval_seconds（加上隨機 jitter）輪詢 Notion，
+同時處理最多 daemon.max_in_flight 篇筆記；處理中的筆記在 Notion 仍是 Ready，
+以 in-flight set 避免重複挑選。收到 SIGTERM / SIGINT 後停止輪詢，
+等待進行中的產圖、審核與狀態寫回完成再結束（再收到一次則直接結束）。
+pregen.enabled 時，沒有待處理筆記的輪詢會在背景預先產圖（見 scheduler/pregen.py）。
+"""
+import random
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from notion.trigger import NotionTrigger
+from utils import config as config_loader
+from utils import metrics, tracing
+from scheduler.pipeline import process_notes
+from scheduler.pregen import PreGenerator, from_config as pregen_from_config
+from utils.journal import Journal, flush_pending
+
+IN_FLIGHT = metrics.gauge("daemon_in_flight", "Notes currently being processed by the daemon")
+POLLS = metrics.counter("daemon_polls_total", "Daemon Notion polls by result (picked / idle / full)")
+
+class Daemon:
+    """Polls Notion on a jittered schedule and processes notes on a bounded executor"""
+
+    def __init__(self, trigger: Optional[NotionTrigger] = None, poll_interval: float = 60.0,
+                 jitter: float = 0.1, max_in_flight: int = 3, journal: Optional[Journal] = None,
+                 pregen: Optional[PreGenerator] = None, **review_options):
+        """
+        Args:
+            trigger: 共用的 NotionTrigger，預設建立新的
+            poll_interval: 輪詢間隔（秒）
+            jitter: 間隔的隨機比例，例如 0.1 代表 ±10%，避免多個 daemon 同時打 Notion
+            max_in_flight: 同時處理的筆記數上限
+            journal: 共用的 journal，預設開啟 journal.jsonl
+            pregen: 閒置時執行的預先產圖，None 代表停用
+            review_options: 轉交給 review_prompt_batch 的參數（例如 decide、preview）
+        """
+        self.trigger = trigger or NotionTrigger()
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self.max_in_flight = max(1, max_in_flight)
+        self.journal = journal or Journal()
+        self.pregen = pregen
+        self.review_options = review_options
+        # 互動審核一次只能有一張；產圖仍可並行
+        self.review_options.setdefault("review_lock", threading.Lock())
+
+        self.stopping = threading.Event()
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="note")
+        # 預先產圖使用獨立的 worker，不佔用筆記的名額，同時只執行一輪
+        self._pregen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pregen")
+        self._pregen_future: Optional[Future] = None
+
+    def next_delay(self) -> float:
+        return max(0.0, self.poll_interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def poll_once(self) -> int:
+        """抓取新的 Ready 筆記並送進 executor，回傳本次新排入的數量"""
+        with self._lock:
+            busy = set(self._in_flight)
+        capacity = self.max_in_flight - len(busy)
+        if capacity <= 0:
+            POLLS.inc(result="full")
+            return 0
+
+        # 處理中的筆記仍會被查到，多抓 len(busy) 筆再排除
+        fetch_start = tracing.now()
+        notes = self.trigger.get_ready_notes(limit=capacity + len(busy))
+        fetch_end = tracing.now()
+
+        picked = [note for note in notes if note["id"] not in busy][:capacity]
+        for note in picked:
+            with self._lock:
+                self._in_flight.add(note["id"])
+                IN_FLIGHT.set(len(self._in_flight))
+            self._executor.submit(self._process, note, (fetch_start, fetch_end))
+
+        POLLS.inc(result="picked" if picked else "idle")
+        return len(picked)
+
+    def _process(self, note: Dict[str, Any], fetched: tuple) -> None:
+        try:
+            process_notes(self.trigger, [note], fetched=fetched, journal=self.journal, **self.review_options)
+        except Exception as e:
+            # 狀態未寫回，筆記維持 Ready，下次輪詢會再處理
+            print(f"⚠️ 筆記 {note['id']} 處理失敗：{e}")
+        finally:
+            tracing.end_trace(note["id"])
+            with self._lock:
+                self._in_flight.discard(note["id"])
+                IN_FLIGHT.set(len(self._in_flight))
+
+    def maybe_pregen(self) -> bool:
+        """沒有進行中的筆記且上一輪已結束時，在背景執行一輪預先產圖；回傳是否已排入"""
+        if self.pregen is None or self.in_flight() or self.stopping.is_set():
+            return False
+        if self._pregen_future is not None and not self._pregen_future.done():
+            return False
+        self._pregen_future = self._pregen_executor.submit(self._run_pregen)
+        return True
+
+    def _run_pregen(self) -> None:
+        try:
+            self.pregen.run_once(stopping=self.stopping)
+        except Exception as e:
+            print(f"⚠️ 預先產圖失敗：{e}")
+
+    def stop(self, signum=None, frame=None) -> None:
+        if self.stopping.is_set():
+            return
+        print(f"🛑 收到停止訊號，等待 {self.in_flight()} 篇進行中的筆記完成...")
+        self.stopping.set()
+        # 再收到一次訊號時使用預設行為（直接結束）
+        if signum is not None:
+            signal.signal(signum, signal.SIG_DFL)
+
+    def run(self) -> None:
+        """輪詢直到 stop()；結束前等待所有進行中的筆記完成"""
+        print(f"🕰️ daemon 啟動：每 {self.poll_interval:g}s 輪詢，最多同時 {self.max_in_flight} 篇")
+        metrics.start_http_server()
+        flush_pending(self.trigger, self.journal)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    if self.poll_once():
+                        print(f"📥 處理中筆記：{self.in_flight()} 篇")
+                    else:
+                        self.maybe_pregen()
+                except Exception as e:
+                    print(f"⚠️ 輪詢失敗：{e}")
+                self.journal.compact()
+                metrics.write_textfile()
+                self.stopping.wait(self.next_delay())
+        finally:
+            self._executor.shutdown(wait=True)
+            self._pregen_executor.shutdown(wait=True)
+            metrics.write_textfile()
+            tracing.TRACER.write()
+            print("👋 daemon 已結束")
+
+def run_daemon(config_path: Optional[str] = None, install_signals: bool = True, **options) -> Daemon:
+    """
+    依 config.yaml 建立並執行 daemon（阻塞直到收到 SIGTERM / SIGINT）
+
+    Args:
+        config_path: 設定檔路徑，預設為 config.yaml
+        install_signals: 是否註冊 SIGTERM / SIGINT（只能在主執行緒註冊）
+        options: 覆寫 Daemon 參數，例如 trigger、decide、pregen
+    """
+    config = config_loader.load_config(config_path)
+    options.setdefault("poll_interval", float(config_loader.get(config, "notion.poll_interval_seconds", 60)))
+    options.setdefault("jitter", float(config_loader.get(config, "daemon.poll_jitter", 0.1)))
+    options.setdefault("max_in_flight", int(config_loader.get(config, "daemon.max_in_flight", 3)))
+    options.setdefault("trigger", NotionTrigger())
+    options.setdefault("pregen", pregen_from_config(config, options["trigger"]))
+
+    daemon = Daemon(**options)
+    if install_signals:
+        signal.signal(signal.SIGTERM, daemon.stop)
+        signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+    return daemon
@@ -0,0 +1,106 @@
+"""
+Pipeline
+One review pass shared by the CLI, the daemon, pre-generation and the bench
+
+    抓取 Ready 筆記 -> 產圖審核 -> 寫回 Notion 狀態
+
+main.py 只負責解析 CLI 參數；daemon / pregen / bench 直接 import 這個模組，
+不會把 main.py（以 python main.py 執行時為 __main__）再載入一次成為另一份 main 模組。
+"""
+from typing import TYPE_CHECKING, Callable, Optional
+
+from utils import metrics, tracing
+
+if TYPE_CHECKING:
+    from notion.trigger import NotionTrigger
+    from utils.journal import Journal
+
+RUN_SECONDS = metrics.histogram("pipeline_run_seconds", "End-to-end run() latency")
+NOTES_IN_RUN = metrics.gauge("pipeline_notes_in_run", "Notes picked up by the latest run")
+STATUS_WRITES = metrics.counter("pipeline_status_writes_total", "Notion status writes by decision")
+STATUS_WRITE_FAILURES = metrics.counter("pipeline_status_write_failures_total", "Failed Notion status writes by decision")
+
+def run(trigger: "NotionTrigger" = None, limit: int = 5, **review_options):
+    """
+    執行一次完整流程：抓取筆記 -> 產圖審核 -> 更新 Notion 狀態
+
+    Args:
+        trigger: 自訂的 NotionTrigger（bench 可指向記憶體版 Notion），預設建立新的
+        limit: 每次抓取的筆記數上限
+        review_options: 轉交給 process_notes 的參數（例如 reviewer、decide、preview）
+    """
+    metrics.start_http_server()
+    try:
+        with RUN_SECONDS.time():
+            return _run(trigger, limit, **review_options)
+    finally:
+        metrics.write_textfile()
+        tracing.TRACER.write()
+
+def _run(trigger: "NotionTrigger" = None, limit: int = 5, **review_options):
+    from notion.trigger import NotionTrigger
+    from utils.journal import Journal, flush_pending
+
+    print("🚀 啟動 Notion 圖文審核流程")
+    trigger = trigger or NotionTrigger()
+    journal = review_options.pop("journal", None) or Journal()
+
+    fetch_start = tracing.now()
+    notes = trigger.get_ready_notes(limit=limit)
+    fetch_end = tracing.now()
+
+    # 上次中斷時已審核但未寫回的狀態先補寫；只處理本次抓到的筆記，
+    # 同時執行的其他流程共用 journal 時，不會透過本次的 trigger 寫入它們的筆記
+    flushed = {note_id for note_id, _ in flush_pending(trigger, journal, note_ids=[note["id"] for note in notes])}
+    notes = [note for note in notes if note["id"] not in flushed]
+    NOTES_IN_RUN.set(len(notes))
+
+    if not notes:
+        print("📭 沒有待處理的筆記")
+        return []
+
+    return process_notes(trigger, notes, fetched=(fetch_start, fetch_end), journal=journal, **review_options)
+
+def note_prompt(note: dict) -> str:
+    """筆記的產圖 prompt（正式流程與預先產圖共用，hash 才會一致）"""
+    return note.get("prompt") or f"{note['title']}\n{note['content']}"
+
+def process_notes(trigger: "NotionTrigger", notes: list, fetched: tuple = None,
+                  journal: "Journal" = None, reviewer: Optional[Callable] = None, **review_options):
+    """
+    產圖審核並將結果寫回 Notion（單次流程與 daemon 共用）
+
+    Args:
+        trigger: 用來寫回狀態的 NotionTrigger
+        notes: get_ready_notes() 回傳的筆記
+        fetched: Notion fetch 的 (start, end)，記在每篇筆記的 trace 上
+        journal: 記錄產圖 / 審核 / 狀態寫回的 journal，中斷後可續跑
+        reviewer: 審核函式 (prompts, journal=..., **review_options) -> [(note_id, decision)]，
+                  預設為 preview.cli.review_prompt_batch（preview.web.review_prompt_batch 為網頁版）
+        review_options: 轉交給 reviewer 的參數
+    """
+    from utils.journal import write_status
+
+    if reviewer is None:
+        from preview.cli import review_prompt_batch as reviewer
+
+    # 每篇筆記一個 trace id，隨 gRPC metadata 傳到 image server；共用的 fetch 記在每篇筆記上
+    prompts = []
+    for note in notes:
+        trace_id = tracing.start_trace(note["id"], label=note.get("title") or note["id"])
+        if fetched:
+            tracing.add_span("fetch", fetched[0], fetched[1], trace_id, notes=len(notes))
+        with tracing.span("prompt_build", trace_id):
+            # 直接使用 note_id 作為識別
+            prompts.append((note["id"], note_prompt(note)))
+
+    reviewed_results = reviewer(prompts, journal=journal, **review_options)
+
+    for note_id, decision in reviewed_results:
+        STATUS_WRITES.inc(decision=decision)
+        with tracing.span("status_write", tracing.trace_id_for(note_id), decision=decision):
+            if not write_status(trigger, note_id, decision, journal):
+                STATUS_WRITE_FAILURES.inc(decision=decision)
+                print(f"⚠️ 筆記 {note_id} 的 Notion 狀態寫回失敗，下次執行時補寫")
+
+    return reviewed_results
@@ -0,0 +1,173 @@
+"""
+Pre-generation
+Speculatively generates images for notes that are about to become Ready, using idle image quota
+
+    python main.py pregen            # 單次執行
+    python main.py --daemon          # config.yaml 的 pregen.enabled 為 true 時，daemon 閒置時自動執行
+
+筆記變成 Ready 前（預設 Status = Draft 且已勾選 Publish）先產圖存進 output/，
+正式流程的 generate_batch 會直接命中本地快取，不必等待 OpenAI。
+
+- 以背景請求送出（x-request-class: background），server 只在 token bucket 有閒置額度時產圖，
+  否則回傳 RESOURCE_EXHAUSTED，本輪即停止，不會排擠正式請求；排隊時也使用最低優先序
+- 每日產圖上限為 pregen.daily_cap，用量記在 pregen_spend.json（AI_POSTER_PREGEN_SPEND），重啟後仍有效
+- output/ 已有圖片的筆記會略過；server 快取命中（x-cache-hits）會寫入 output/ 但不計入用量
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from notion.trigger import NotionTrigger
+from scheduler.pipeline import note_prompt
+from utils import config as config_loader
+from utils.fsutil import atomic_write
+from utils import metrics
+
+DEFAULT_SPEND_PATH = "pregen_spend.json"
+
+PREGEN_IMAGES = metrics.counter("pregen_images_total", "Pre-generated images written to output/")
+PREGEN_RUNS = metrics.counter("pregen_runs_total", "Pre-generation runs by result (generated / idle / capped / shed)")
+
+class SpendLedger:
+    """Counts pre-generated images per day in a small JSON file so the cap survives restarts"""
+
+    def __init__(self, daily_cap: int, path: Optional[str] = None):
+        """
+        Args:
+            daily_cap: 每日預先產圖的張數上限
+            path: 用量檔路徑，預設讀取 AI_POSTER_PREGEN_SPEND 或 pregen_spend.json
+        """
+        self.daily_cap = max(0, daily_cap)
+        self.path = path or os.environ.get("AI_POSTER_PREGEN_SPEND") or DEFAULT_SPEND_PATH
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 跨日後重新計算
+        return data if data.get("date") == time.strftime("%Y-%m-%d") else {}
+
+    def spent(self) -> int:
+        with self._lock:
+            return int(self._load().get("images", 0))
+
+    def remaining(self) -> int:
+        return max(0, self.daily_cap - self.spent())
+
+    def spend(self, images: int) -> None:
+        """記錄已產生的張數，先寫暫存檔再 rename"""
+        with self._lock:
+            data = {"date": time.strftime("%Y-%m-%d"), "images": int(self._load().get("images", 0)) + images}
+            atomic_write(self.path, json.dumps(data))
+
+class PreGenerator:
+    """Generates images for upcoming notes in small background batches until quota or the cap runs out"""
+
+    def __init__(self, trigger: Optional[NotionTrigger] = None, status: str = "Draft",
+                 require_publish: bool = True, daily_cap: int = 20, batch_size: int = 4,
+                 lookahead: int = 20, ledger: Optional[SpendLedger] = None):
+        """
+        Args:
+            trigger: 共用的 NotionTrigger，預設建立新的
+            status / require_publish: 視為「即將 Ready」的篩選條件
+            daily_cap: 每日預先產圖的張數上限
+            batch_size: 每個 GenerateBatch 的張數；小批次讓閒置額度用完時能及早停止
+            lookahead: 每次最多查詢的筆記數
+            ledger: 用量紀錄，預設依 daily_cap 建立
+        """
+        self.trigger = trigger or NotionTrigger()
+        self.status = status
+        self.require_publish = require_publish
+        self.batch_size = max(1, batch_size)
+        self.lookahead = lookahead
+        self.ledger = ledger or SpendLedger(daily_cap)
+
+    def pending_prompts(self) -> List[str]:
+        """即將 Ready、且 output/ 中還沒有圖片的 prompt"""
+        from image.client.client import cached_image
+
+        notes = self.trigger.get_upcoming_notes(limit=self.lookahead, status=self.status,
+                                                require_publish=self.require_publish)
+        prompts = dict.fromkeys(note_prompt(note) for note in notes)
+        return [prompt for prompt in prompts if not cached_image(prompt)]
+
+    def run_once(self, stopping: Optional[threading.Event] = None) -> int:
+        """
+        預先產圖直到沒有待產的筆記、達到每日上限或 server 沒有閒置額度
+
+        Args:
+            stopping: 設定後在下一個 batch 前停止（daemon 收到 SIGTERM 時）
+
+        Returns:
+            本次產生的張數
+        """
+        import grpc
+        from image.client.client import PRIORITY_BACKGROUND, generate_batch
+
+        remaining = self.ledger.remaining()
+        if remaining <= 0:
+            PREGEN_RUNS.inc(result="capped")
+            return 0
+
+        prompts = self.pending_prompts()
+        if not prompts:
+            PREGEN_RUNS.inc(result="idle")
+            return 0
+
+        print(f"🔮 預先產圖：{len(prompts)} 篇即將 Ready 的筆記（今日剩餘額度 {remaining} 張）")
+        generated = 0
+        result = "generated"
+        while prompts:
+            if stopping is not None and stopping.is_set():
+                break
+            # 每個 batch 不超過剩餘額度；server 快取命中不扣額度，剩下的額度留給後面的 batch
+            remaining = self.ledger.remaining()
+            if remaining <= 0:
+                result = "capped"
+                break
+            size = min(self.batch_size, remaining)
+            batch, prompts = prompts[:size], prompts[size:]
+            stats: Dict[str, int] = {}
+            try:
+                images = generate_batch(batch, background=True, priority=PRIORITY_BACKGROUND, stats=stats)
+            except grpc.RpcError as e:
+                # 部分分組失敗時，已完成的分組仍花了 OpenAI 額度
+                self.ledger.spend(stats.get("generated", 0))
+                if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    raise
+                print("⏸️ image server 沒有閒置額度，預先產圖稍後再試")
+                result = "shed"
+                break
+            # server 快取命中不花 OpenAI 額度，只有實際產生的張數計入每日上限
+            self.ledger.spend(stats.get("generated", 0))
+            PREGEN_IMAGES.inc(len(images))
+            generated += len(images)
+
+        PREGEN_RUNS.inc(result=result)
+        if generated:
+            print(f"🔮 已預先產生 {generated} 張圖片")
+        return generated
+
+def from_config(config: Dict[str, Any], trigger: Optional[NotionTrigger] = None,
+                force: bool = False) -> Optional[PreGenerator]:
+    """
+    依 config.yaml 的 pregen 區段建立 PreGenerator，未啟用時回傳 None
+
+    Args:
+        force: 忽略 pregen.enabled（CLI 手動執行時）
+    """
+    if not force and not config_loader.get(config, "pregen.enabled", False):
+        return None
+    return PreGenerator(
+        trigger=trigger,
+        status=str(config_loader.get(config, "pregen.status", "Draft")),
+        require_publish=bool(config_loader.get(config, "pregen.require_publish", True)),
+        daily_cap=int(config_loader.get(config, "pregen.daily_cap", 20)),
+        batch_size=int(config_loader.get(config, "pregen.batch_size", 4)),
+        lookahead=int(config_loader.get(config, "pregen.lookahead", 20)),
+    )
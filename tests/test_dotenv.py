@@ -0,0 +1,27 @@
+"""
+.env loading tests
+AI_POSTER_* flags set only in .env must be visible when utils modules read them at import time
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import main
+main.cli(["history", "--file", "missing.csv"])
+from utils import metrics
+print("enabled" if metrics.enabled() else "disabled")
+"""
+
+def test_metrics_flag_from_dotenv(tmp_path):
+    # load_dotenv() 從 main.py 所在目錄往上找 .env，以 symlink 讓它找到暫存目錄的 .env
+    (tmp_path / "main.py").symlink_to(os.path.join(ROOT, "main.py"))
+    (tmp_path / ".env").write_text("AI_POSTER_METRICS=1\n", encoding="utf-8")
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AI_POSTER_")}
+    env["PYTHONPATH"] = ROOT
+
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "enabled"
@@ -0,0 +1,81 @@
+"""
+Review journal tests
+Replay after a restart, a torn last line, compaction of finished notes and status write-back
+"""
+import json
+
+from utils.journal import Journal, flush_pending
+
+class RecordingTrigger:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.calls = []
+
+    def mark_as_published(self, page_id, post_url=None):
+        self.calls.append((page_id, "posted"))
+        return self.ok
+
+    def mark_as_skipped(self, page_id):
+        self.calls.append((page_id, "skipped"))
+        return self.ok
+
+    def mark_for_retry(self, page_id):
+        self.calls.append((page_id, "retry"))
+        return self.ok
+
+def lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_replay_restores_images_and_decisions(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    journal = Journal(str(path))
+    journal.record("generated", "n1", prompt="p1", prompt_hash="h1", filepath=str(image))
+    journal.record("generated", "n2", prompt="p2", prompt_hash="h2", filepath=str(tmp_path / "gone.png"))
+    journal.record("decision", "n1", decision="posted", prompt_hash="h1")
+
+    reopened = Journal(str(path))
+    assert reopened.decision("n1") == "posted"
+    assert reopened.generated("n1", "p1") == ("h1", "p1", str(image))
+    # prompt 已變更或圖片已刪除時不沿用
+    assert reopened.generated("n1", "changed") is None
+    assert reopened.generated("n2", "p2") is None
+    assert reopened.pending_status_writes() == [("n1", "posted")]
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    Journal(str(path)).record("decision", "n1", decision="skipped", prompt_hash="h1")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"event": "decision", "note_id": "n2", "deci')
+    journal = Journal(str(path))
+    assert journal.decision("n1") == "skipped"
+    assert journal.decision("n2") is None
+
+def test_compact_drops_finished_notes(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path))
+    journal.record("decision", "done", decision="posted", prompt_hash="h1")
+    journal.record("status_written", "done", decision="posted")
+    journal.record("decision", "open", decision="skipped", prompt_hash="h2")
+
+    Journal(str(path))
+    assert [(e["event"], e["note_id"]) for e in lines(path)] == [("decision", "open")]
+    assert not (tmp_path / "journal.jsonl.tmp").exists()
+
+def test_flush_pending_only_touches_requested_notes(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.record("decision", "mine", decision="retry", prompt_hash="h1")
+    journal.record("decision", "other", decision="posted", prompt_hash="h2")
+    trigger = RecordingTrigger()
+
+    assert flush_pending(trigger, journal, note_ids=["mine"]) == [("mine", "retry")]
+    assert trigger.calls == [("mine", "retry")]
+    assert journal.pending_status_writes() == [("other", "posted")]
+
+def test_failed_status_write_stays_pending(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path))
+    journal.record("decision", "n1", decision="posted", prompt_hash="h1")
+    assert flush_pending(RecordingTrigger(ok=False), journal) == []
+    assert Journal(str(path)).pending_status_writes() == [("n1", "posted")]
@@ -0,0 +1,82 @@
+"""
+Circuit breaker tests
+State changes of CircuitBreaker and which status codes ReplicaPool counts against a replica
+"""
+import types
+
+import grpc
+import pytest
+
+from image.client import resilience
+from image.client.replicas import ReplicaPool
+from image.client.resilience import CircuitBreaker
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+def test_trips_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(reset_seconds=30)
+    breaker.trip()
+    clock.now += 31
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    assert breaker.is_open()
+    # hedge 落敗歸還名額後可以再試探一次
+    breaker.release()
+    assert breaker.allow_request()
+
+def test_probe_result_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.trip()
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.parametrize("code, state", [
+    (grpc.StatusCode.UNAVAILABLE, CircuitBreaker.OPEN),
+    (grpc.StatusCode.DEADLINE_EXCEEDED, CircuitBreaker.OPEN),
+    (grpc.StatusCode.INTERNAL, CircuitBreaker.OPEN),
+    (grpc.StatusCode.UNKNOWN, CircuitBreaker.CLOSED),
+    (grpc.StatusCode.INVALID_ARGUMENT, CircuitBreaker.CLOSED),
+    (grpc.StatusCode.RESOURCE_EXHAUSTED, CircuitBreaker.CLOSED),
+])
+def test_pool_counts_only_replica_faults(clock, code, state):
+    pool = ReplicaPool(["a:1"], lambda channel: None, failure_threshold=1, hedge_ratio=0)
+    pool.record_failure("a:1", code)
+    assert pool.breaker("a:1").state == state
+
+def test_application_error_releases_probe(clock):
+    pool = ReplicaPool(["a:1"], lambda channel: None, eject_seconds=30, hedge_ratio=0)
+    pool.eject("a:1")
+    clock.now += 31
+    breaker = pool.breaker("a:1")
+    assert breaker.allow_request()
+    pool.record_failure("a:1", grpc.StatusCode.UNKNOWN)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
@@ -0,0 +1,35 @@
+"""
+Consistent hashing tests
+Adding or removing a replica only moves the keys that belong to it
+"""
+from image.client.sharding import HashRing
+
+NODES = [f"localhost:{50051 + i}" for i in range(3)]
+KEYS = [f"prompt #{i}" for i in range(5000)]
+
+def owners(ring):
+    return {key: ring.get_node(key) for key in KEYS}
+
+def test_add_node_moves_about_its_share():
+    before = owners(HashRing(NODES))
+    extra = "localhost:50060"
+    after = owners(HashRing(NODES + [extra]))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    # 理想值為 1 / (n + 1)；移動的 key 全部落到新節點
+    assert abs(len(moved) / len(KEYS) - 1 / (len(NODES) + 1)) < 0.05
+    assert all(after[key] == extra for key in moved)
+
+def test_remove_node_moves_only_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    ring.remove_node(NODES[0])
+    after = owners(ring)
+    assert all(before[key] == NODES[0] for key in KEYS if before[key] != after[key])
+    assert NODES[0] not in after.values()
+
+def test_get_nodes_returns_distinct_fallbacks():
+    ring = HashRing(NODES)
+    for key in KEYS[:100]:
+        nodes = ring.get_nodes(key, 5)
+        assert nodes[0] == ring.get_node(key)
+        assert sorted(nodes) == sorted(NODES)
@@ -0,0 +1,30 @@
+"""
+CLI startup regression tests
+Runs the bench.startup checks under pytest: no heavy imports on `--help` and a startup-time budget
+"""
+import os
+
+import pytest
+
+from bench import startup
+
+@pytest.fixture(scope="module")
+def checks():
+    return startup.probe()
+
+def test_help_loads_no_heavy_modules(checks):
+    assert checks["heavy_after_help"] == []
+
+def test_import_main_loads_no_heavy_modules(checks):
+    assert checks["heavy_after_import_main"] == []
+
+def test_client_import_has_no_side_effects(checks):
+    assert not checks["sys_path_changed"]
+    assert not checks["output_dir_created"]
+    assert not checks["pb_loaded_by_client_import"]
+
+def test_help_within_startup_budget():
+    # 較慢的機器可用 AI_POSTER_STARTUP_BUDGET_MS 放寬預算
+    budget_ms = float(os.environ.get("AI_POSTER_STARTUP_BUDGET_MS", startup.DEFAULT_BUDGET_MS))
+    report = startup.check(runs=5, budget_ms=budget_ms)
+    assert report["overhead_ms"]["help"] <= budget_ms, report
@@ -0,0 +1,77 @@
+"""
+Web review session tests
+Concurrent key presses record one decision per note, and R records the same history as the CLI
+"""
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from preview import web
+from utils.journal import Journal
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    image = tmp_path / "image.png"
+    Image.new("RGB", (8, 8)).save(image)
+    history = []
+    monkeypatch.setattr(web, "generate_image", lambda prompt, **kwargs: (str(image), f"hash-{prompt}"))
+    monkeypatch.setattr(web, "record_decision", lambda prompt_hash, decision: history.append((prompt_hash, decision)))
+
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    session = web.ReviewSession([("n0", "p0"), ("n1", "p1")], journal=journal)
+    session.history = history
+    session.start()
+    wait_for(lambda: all(item["status"] == "ready" for item in session.items))
+    yield session
+    session.close()
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_concurrent_decisions_apply_once(session):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def press():
+        barrier.wait()
+        results.append(session.decide(0, "y"))
+
+    threads = [threading.Thread(target=press) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(result is not None for result in results) == 1
+    assert session.history == [("hash-p0", "posted")]
+    assert session.journal.decision("n0") == "posted"
+
+def test_decision_rejected_while_regenerating(session, monkeypatch):
+    release = threading.Event()
+    regenerated = session.items[1]["filepath"]
+
+    def slow_generate(prompt, **kwargs):
+        release.wait(5)
+        return regenerated, "hash-new"
+
+    monkeypatch.setattr(web, "generate_image", slow_generate)
+    assert session.decide(1, "r")["status"] == "regenerating"
+    assert session.decide(1, "y") is None
+    release.set()
+    wait_for(lambda: session.items[1]["status"] == "retry")
+
+    # 與 CLI 相同：重產的圖記為發佈，筆記記為 retry
+    assert session.history == [("hash-new", "posted")]
+    assert session.journal.decision("n1") == "retry"
+    assert session.decide(1, "s") is None
+
+def test_invalid_index_or_key(session):
+    assert session.decide(5, "y") is None
+    assert session.decide(-1, "y") is None
+    assert session.decide(0, "x") is None
+    assert session.history == []
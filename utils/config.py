@@ -0,0 +1,53 @@
+"""
+Config Module
+Loads config.yaml and expands ${ENV} references
+"""
+import os
+import re
+from typing import Any, Dict, Optional
+
+import yaml
+
+# 專案根目錄的 config.yaml，可用 AI_POSTER_CONFIG 指向其他檔案
+DEFAULT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.yaml"))
+
+_ENV_PATTERN = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)(?::-([^}]*))?\}")
+
+def _expand(value: Any) -> Any:
+    """遞迴展開 ${VAR} / ${VAR:-default}；整個值只有一個未設定的變數時回傳 None"""
+    if isinstance(value, dict):
+        return {k: _expand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_expand(v) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    match = _ENV_PATTERN.fullmatch(value)
+    if match and match.group(2) is None and match.group(1) not in os.environ:
+        return None
+    return _ENV_PATTERN.sub(lambda m: os.environ.get(m.group(1), m.group(2) or ""), value)
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    讀取設定檔
+
+    Args:
+        path: 設定檔路徑，預設為 AI_POSTER_CONFIG 或專案根目錄的 config.yaml
+
+    Returns:
+        設定 dict；檔案不存在時回傳空 dict
+    """
+    path = path or os.environ.get("AI_POSTER_CONFIG") or DEFAULT_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return _expand(yaml.safe_load(f) or {})
+
+def get(config: Dict[str, Any], key: str, default: Any = None) -> Any:
+    """以點分隔的路徑取值，例如 get(config, "notion.poll_interval_seconds", 60)"""
+    value: Any = config
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return default if value is None else value
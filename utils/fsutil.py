@@ -0,0 +1,27 @@
+"""
+Filesystem Module
+Crash-safe file replacement shared by the journal, metrics, tracing and pregen spend ledger
+"""
+import contextlib
+import os
+
+def atomic_write(path: str, text: str) -> str:
+    """
+    先寫同目錄的暫存檔並 fsync，再以 os.replace 換上；當機或寫入失敗時舊檔仍完整
+
+    Returns:
+        寫入的路徑
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    return path
@@ -0,0 +1,156 @@
+"""
+Journal Module
+Append-only, fsync'd session journal used to resume an interrupted review
+
+每個事件一行 JSON，寫入後立即 fsync：
+    generated       {"note_id", "prompt", "prompt_hash", "filepath"}  圖片已產生並存檔
+    decision        {"note_id", "decision", "prompt_hash"}            審核結果（posted / skipped / retry）
+    status_written  {"note_id", "decision"}                           Notion 狀態已寫回
+
+重新執行時：已產生的圖片直接沿用、已審核的筆記不再詢問、
+有決策但尚未寫回 Notion 的筆記會先補寫（flush_pending，單次流程只補寫本次抓到的筆記）。
+預設路徑為目前目錄的 journal.jsonl（與 history.csv 相同），可用 AI_POSTER_JOURNAL 指定。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.fsutil import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "journal.jsonl"
+
+class Journal:
+    """Replays the journal into per-note state on open and appends new events durably"""
+
+    def __init__(self, path: Optional[str] = None, compact: bool = True):
+        """
+        Args:
+            path: journal 路徑，預設讀取 AI_POSTER_JOURNAL 或 journal.jsonl
+            compact: 開啟時移除已完成（狀態已寫回）筆記的事件，避免檔案無限成長
+        """
+        self.path = path or os.environ.get("AI_POSTER_JOURNAL") or DEFAULT_PATH
+        # 只保存尚未完成的筆記；狀態寫回後即移除，筆記之後再變回 Ready 時會重新處理
+        self._notes: Dict[str, Dict[str, Any]] = {}
+        self._finished = 0
+        self._lock = threading.Lock()
+        self._load()
+        if compact:
+            self.compact()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:
+                    # 寫到一半當機只會影響最後一行，略過即可
+                    logger.warning(f"journal 第 {line_no} 行無法解析，已略過：{self.path}")
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        note_id = event.get("note_id")
+        if not note_id:
+            return
+        state = self._notes.setdefault(note_id, {"events": []})
+        state["events"].append(event)
+        kind = event.get("event")
+        if kind == "generated":
+            state["generated"] = event
+        elif kind == "decision":
+            state["decision"] = event.get("decision")
+        elif kind == "status_written":
+            del self._notes[note_id]
+            self._finished += 1
+
+    def record(self, event: str, note_id: str, **fields) -> None:
+        """附加一個事件並 fsync，回傳時事件已落盤"""
+        entry = {"event": event, "note_id": note_id, "ts": round(time.time(), 3), **fields}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def generated(self, note_id: str, prompt: str) -> Optional[Tuple[str, str, str]]:
+        """
+        回傳先前為同一個 prompt 產生的圖片 (prompt_hash, prompt, filepath)
+
+        prompt 已變更或檔案已被刪除時回傳 None。
+        """
+        with self._lock:
+            event = self._notes.get(note_id, {}).get("generated")
+        if not event or event.get("prompt") != prompt or not os.path.exists(event.get("filepath", "")):
+            return None
+        return event["prompt_hash"], event["prompt"], event["filepath"]
+
+    def decision(self, note_id: str) -> Optional[str]:
+        with self._lock:
+            return self._notes.get(note_id, {}).get("decision")
+
+    def pending_status_writes(self) -> List[Tuple[str, str]]:
+        """已有決策但尚未寫回 Notion 的 (note_id, decision)"""
+        with self._lock:
+            return [
+                (note_id, state["decision"])
+                for note_id, state in self._notes.items()
+                if state.get("decision")
+            ]
+
+    def compact(self) -> None:
+        """只保留尚未完成的筆記，先寫暫存檔再 rename（當機時舊檔仍完整）"""
+        with self._lock:
+            if not self._finished or not os.path.exists(self.path):
+                return
+            atomic_write(self.path, "".join(
+                json.dumps(event, ensure_ascii=False) + "\n"
+                for state in self._notes.values()
+                for event in state["events"]
+            ))
+            self._finished = 0
+
+def write_status(trigger, note_id: str, decision: str, journal: Optional[Journal] = None) -> bool:
+    """
+    依決策寫回 Notion 狀態，成功時記錄 status_written
+
+    Returns:
+        是否寫入成功；失敗的筆記下次執行時會由 flush_pending 補寫
+    """
+    if decision == "posted":
+        ok = trigger.mark_as_published(note_id, post_url=None)
+    elif decision == "skipped":
+        ok = trigger.mark_as_skipped(note_id)
+    else:
+        ok = trigger.mark_for_retry(note_id)
+    if ok and journal is not None:
+        journal.record("status_written", note_id, decision=decision)
+    return ok
+
+def flush_pending(trigger, journal: Journal, note_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+    """
+    補寫上次中斷時尚未寫回 Notion 的狀態，回傳成功補寫的 (note_id, decision)
+
+    Args:
+        note_ids: 只補寫這些筆記（本次抓到的筆記）；同一個 journal 可能有其他執行中的流程，
+                  不應透過本次的 trigger 寫入別人的筆記。None 時補寫全部（daemon 獨佔 journal）
+    """
+    only = set(note_ids) if note_ids is not None else None
+    flushed = []
+    for note_id, decision in journal.pending_status_writes():
+        if only is not None and note_id not in only:
+            continue
+        if write_status(trigger, note_id, decision, journal):
+            flushed.append((note_id, decision))
+    if flushed:
+        print(f"♻️ 已補寫 {len(flushed)} 筆上次未完成的 Notion 狀態")
+    return flushed
@@ -0,0 +1,310 @@
+"""
+Metrics Module
+Lightweight counters, gauges and histograms exported in Prometheus text format
+
+預設停用，停用時每個記錄點只多一次布林判斷。啟用方式：
+    AI_POSTER_METRICS=1                 # 啟用收集
+    AI_POSTER_METRICS_FILE=metrics.prom # 流程結束時寫出 textfile（可給 node_exporter 收）
+    AI_POSTER_METRICS_PORT=9108         # 啟動本機 HTTP /metrics 端點
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from utils.fsutil import atomic_write
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ai_poster_"
+# 秒數為單位，涵蓋 Notion / 發佈（毫秒級）到 OpenAI 產圖（數十秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class _State:
+    enabled = os.environ.get("AI_POSTER_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+
+_state = _State()
+
+def enabled() -> bool:
+    return _state.enabled
+
+def enable() -> None:
+    _state.enabled = True
+
+def disable() -> None:
+    _state.enabled = False
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _NullTimer:
+    """停用時共用的計時器，不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, histogram: "Histogram", labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class _Metric(ABC):
+    """Base class for exported metrics; subclasses render their own samples"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = PREFIX + name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """各 label 組合的樣本行（Prometheus text format）"""
+        pass
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not _state.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        if not _state.enabled:
+            return
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (seconds by default)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (各 bucket 計數, sum, count)
+        self._values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not _state.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """計時 context manager：with HIST.time(op="query"): ..."""
+        if not _state.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def timed(self, **labels):
+        """計時 decorator：@HIST.timed(platform="instagram")"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _state.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(_label_key(labels))
+            return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Registry:
+    """Holds all metrics; metrics are created once at import time of the instrumented module"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(PREFIX + name)
+            if metric is None:
+                metric = cls(name, help, **kwargs)
+                self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, help: str) -> Counter:
+    return REGISTRY._get_or_create(Counter, name, help)
+
+def gauge(name: str, help: str) -> Gauge:
+    return REGISTRY._get_or_create(Gauge, name, help)
+
+def histogram(name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY._get_or_create(Histogram, name, help, buckets=buckets)
+
+def render() -> str:
+    """輸出 Prometheus text format"""
+    return REGISTRY.render()
+
+def write_textfile(path: Optional[str] = None) -> Optional[str]:
+    """
+    將目前的 metrics 寫成 Prometheus textfile（先寫暫存檔再 rename，避免讀到半份）
+
+    Args:
+        path: 輸出路徑，預設讀取 AI_POSTER_METRICS_FILE
+
+    Returns:
+        實際寫入的路徑；停用或未設定路徑時回傳 None
+    """
+    path = path or os.environ.get("AI_POSTER_METRICS_FILE")
+    if not _state.enabled or not path:
+        return None
+    return atomic_write(path, render())
+
+_server: Optional["ThreadingHTTPServer"] = None
+_server_lock = threading.Lock()
+
+def _handler_class():
+    # http.server 只在啟用端點時載入，避免拖慢 CLI 啟動
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return MetricsHandler
+
+def start_http_server(port: Optional[int] = None, addr: str = "127.0.0.1") -> Optional["ThreadingHTTPServer"]:
+    """
+    在背景執行緒提供 /metrics
+
+    Args:
+        port: 監聽埠，預設讀取 AI_POSTER_METRICS_PORT
+        addr: 監聽位址，預設只開本機
+
+    Returns:
+        server 物件（重複呼叫會回傳同一個）；停用或未設定埠時回傳 None
+    """
+    global _server
+    port = port or int(os.environ.get("AI_POSTER_METRICS_PORT", "0") or 0)
+    if not _state.enabled or not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            from http.server import ThreadingHTTPServer
+            _server = ThreadingHTTPServer((addr, port), _handler_class())
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"metrics endpoint on http://{addr}:{port}/metrics")
+        return _server
@@ -0,0 +1,233 @@
+"""
+Tracing Module
+Per-note trace ids and stage spans written as Chrome trace JSON
+
+每篇筆記一個 trace id（由 main.py 建立），經 gRPC metadata x-trace-id 傳給 image server，
+server 以 x-server-timing trailer 回傳各階段耗時（queue / openai / encode）。
+
+設定 AI_POSTER_TRACE_FILE=trace.json 後會記錄 span，流程結束時寫出 Chrome trace JSON，
+可用 chrome://tracing 或 https://ui.perfetto.dev 開啟；每篇筆記一列，方便找出 critical path。
+未設定時 trace id 仍會傳遞（server log 可對照），但不記錄 span。
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.fsutil import atomic_write
+
+TRACE_HEADER = "x-trace-id"
+SERVER_TIMING_HEADER = "x-server-timing"
+# 長時間執行（daemon）時只保留最近的事件
+MAX_EVENTS = int(os.environ.get("AI_POSTER_TRACE_MAX_EVENTS", "100000"))
+
+_current: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+class Tracer:
+    """Collects complete ("X") events, one Chrome trace lane per trace id"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.origin = time.perf_counter()
+        self._events: deque = deque(maxlen=MAX_EVENTS)
+        self._lanes: Dict[str, int] = {}
+        self._labels: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _lane(self, trace_id: Optional[str]) -> int:
+        if not trace_id:
+            return 0
+        lane = self._lanes.get(trace_id)
+        if lane is None:
+            lane = len(self._lanes) + 1
+            self._lanes[trace_id] = lane
+        return lane
+
+    def start_trace(self, key: str, label: Optional[str] = None) -> str:
+        trace_id = new_trace_id()
+        with self._lock:
+            self._keys[key] = trace_id
+            self._labels[trace_id] = label or key
+        return trace_id
+
+    def trace_id_for(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._keys.get(key)
+
+    def end_trace(self, key: str) -> None:
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def add(self, name: str, start: float, end: float, trace_id: Optional[str],
+            category: str = "client", **args) -> None:
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round(max(0.0, end - start) * 1e6, 1),
+            "pid": 1,
+            "args": dict(args, trace_id=trace_id) if trace_id else args,
+        }
+        with self._lock:
+            event["tid"] = self._lane(trace_id)
+            self._events.append(event)
+
+    def to_json(self) -> Dict[str, object]:
+        with self._lock:
+            events = list(self._events)
+            lanes = dict(self._lanes)
+            labels = dict(self._labels)
+        meta = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "ai-poster"}},
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "run"}}]
+        for trace_id, lane in lanes.items():
+            name = f"{labels.get(trace_id, 'trace')} ({trace_id[:8]})"
+            meta.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": name}})
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.path
+        if not path:
+            return None
+        return atomic_write(path, json.dumps(self.to_json()))
+
+TRACER = Tracer(os.environ.get("AI_POSTER_TRACE_FILE") or None)
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+def enabled() -> bool:
+    return TRACER.enabled
+
+def enable(path: str) -> None:
+    TRACER.path = path
+
+def disable() -> None:
+    TRACER.path = None
+
+def now() -> float:
+    """span 使用的時鐘（perf_counter 秒數）"""
+    return time.perf_counter()
+
+def start_trace(key: str, label: Optional[str] = None) -> str:
+    """為一篇筆記（key 為 note id）建立 trace id，之後可用 trace_id_for(key) 查回"""
+    return TRACER.start_trace(key, label)
+
+def trace_id_for(key: str) -> Optional[str]:
+    return TRACER.trace_id_for(key)
+
+def end_trace(key: str) -> None:
+    """筆記處理完成後移除 key 對應（daemon 長時間執行時避免累積）；已記錄的 span 不受影響"""
+    TRACER.end_trace(key)
+
+def current_trace_id() -> Optional[str]:
+    return _current.get()
+
+@contextlib.contextmanager
+def use_trace(trace_id: Optional[str]):
+    """在區塊內將 trace_id 設為目前的 trace（contextvars，執行緒各自獨立）"""
+    token = _current.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _current.reset(token)
+
+def call_with_trace(trace_id: Optional[str], func: Callable, *args, **kwargs):
+    """在指定 trace 下呼叫 func，用於丟進 thread pool 的工作（contextvars 不會自動帶過去）"""
+    with use_trace(trace_id):
+        return func(*args, **kwargs)
+
+@contextlib.contextmanager
+def span(name: str, trace_id: Optional[str] = None, **args):
+    """記錄一個階段的耗時；trace_id 預設為目前的 trace"""
+    if not TRACER.enabled:
+        yield
+        return
+    trace_id = trace_id or _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TRACER.add(name, start, time.perf_counter(), trace_id, **args)
+
+def add_span(name: str, start: float, end: float, trace_id: Optional[str] = None, **args) -> None:
+    """以既有的起訖時間（now() 取得）補記 span，例如多篇筆記共用的 Notion fetch"""
+    TRACER.add(name, start, end, trace_id or _current.get(), **args)
+
+def grpc_metadata(trace_ids: Sequence[Optional[str]]) -> Tuple[Tuple[str, str], ...]:
+    """轉成 gRPC metadata；batch 依 prompt 順序各帶一個 x-trace-id"""
+    return tuple((TRACE_HEADER, trace_id) for trace_id in trace_ids if trace_id)
+
+def parse_server_timing(value: str) -> List[Tuple[str, float, str]]:
+    """
+    解析 Server-Timing 格式：'openai;dur=1520.3, encode;dur=12.0'
+
+    Returns:
+        [(name, dur_ms, desc)]
+    """
+    entries = []
+    for part in value.split(","):
+        fields = [f.strip() for f in part.split(";") if f.strip()]
+        if not fields:
+            continue
+        name, dur, desc = fields[0], 0.0, ""
+        for field in fields[1:]:
+            key, _, val = field.partition("=")
+            if key == "dur":
+                try:
+                    dur = float(val)
+                except ValueError:
+                    pass
+            elif key == "desc":
+                desc = val.strip('"')
+        entries.append((name, dur, desc))
+    return entries
+
+def record_server_timing(trailers: Optional[Iterable], start: float, end: float,
+                         trace_id: Optional[str] = None,
+                         trace_ids: Optional[Dict[str, str]] = None) -> None:
+    """
+    將 x-server-timing trailer 轉成 server 端的 span
+
+    server 與 client 時鐘不同，server 各階段依序排在 RPC 期間內，
+    並以 server 總耗時置中（網路時間平均分配在前後）。
+
+    Args:
+        trailers: call.trailing_metadata()
+        start / end: client 端 RPC 起訖（now()）
+        trace_id: 單張請求的 trace id
+        trace_ids: batch 用，prompt hash -> trace id（每個 item 以 item;desc=<hash> 標示）
+    """
+    if not TRACER.enabled or not trailers:
+        return
+    values = [v for k, v in trailers if k == SERVER_TIMING_HEADER]
+    parsed = [parse_server_timing(v if isinstance(v, str) else v.decode("utf-8")) for v in values]
+
+    total = 0.0
+    for entries in parsed:
+        for name, dur, _ in entries:
+            if name == "total":
+                total = max(total, dur / 1000)
+    server_start = start + max(0.0, (end - start) - total) / 2
+
+    for entries in parsed:
+        item = next((desc for name, _, desc in entries if name == "item"), "")
+        owner = (trace_ids or {}).get(item, trace_id) if item else trace_id
+        cursor = server_start
+        for name, dur, _ in entries:
+            if name in ("item", "total"):
+                continue
+            TRACER.add(f"server:{name}", cursor, cursor + dur / 1000, owner, category="server")
+            cursor += dur / 1000